@@ -1,42 +1,129 @@
-import copy
+from algorithm.InsertionEvaluator import InsertionEvaluator, cargo_after_current, leg_time, service_time
+from model.Operation import Operation
+from model.Status import Status
 
 
 def find_best_insert_vehicle_position(model, order, lmbda = 1):
     """
     寻找 model 中最适合插入 order 的车辆和任务位置
+    Each candidate is scored by the marginal distance and delay of the insertion (InsertionEvaluator),
+    the model is neither copied nor simulated.
     :param model:
     :param order:
-    :return:
+    :param lmbda: weight of the delay in the cost
+    :return: (car_num, (pick_up_i, delivery_j)), or (None, (None, None)) if no feasible position is found
+    """
+    with model.profiler.phase('find_best_insert_vehicle_position'):
+        evaluator = InsertionEvaluator(model.route, lmbda, profiler=model.profiler)
+        cost, car_num, position = best_insertion(model, order, evaluator)
+    model.profiler.count('candidates', evaluator.evaluations)
+    return car_num, position
+
+
+def best_insertion(model, order, evaluator, car_nums = None, cache = None):
+    """
+    寻找 car_nums 中最适合插入 order 的车辆和任务位置
+    :param model:
+    :param order:
+    :param evaluator: InsertionEvaluator of the model
+    :param car_nums: vehicles to try, in this order, all vehicles of the model by default
+    :param cache: dict memoizing the best position of the order in each vehicle (see vehicle_best_insertion),
+                  to be used for one slice: the entries of a vehicle are reused until its version changes
+    :return: (cost, car_num, (pick_up_i, delivery_j)), cost is -inf for an idle vehicle
+             and (inf, None, (None, None)) if no feasible position is found
+    """
+    with model.profiler.phase('best_insertion'):
+        if car_nums is None:
+            car_nums = list(model.vehicle_dict.keys())
+        min_cost = float('inf')
+        best_position = (None, None)
+        best_vehicle = None
+        rejections = 0
+        # 优先插入空车
+        for car_num in car_nums:
+            vehicle = model.vehicle_dict[car_num]
+            if vehicle.status == Status.IDLE or not vehicle.assignment_list:
+                return float('-inf'), vehicle.car_num, (0, 0)
+        for car_num in car_nums:
+            vehicle = model.vehicle_dict[car_num]
+            if cache is None:
+                cost, position = vehicle_best_insertion(vehicle, order, evaluator)
+            else:
+                cost, position = cached_best_insertion(cache, vehicle, order, evaluator)
+            if cost == float('inf'):
+                rejections += 1
+            if cost < min_cost:
+                min_cost = cost
+                best_position = position
+                best_vehicle = vehicle
+        model.profiler.count('rejections', rejections)
+        if best_vehicle is None:
+            # print("No feasible position found for order", order.order_id)
+            return min_cost, None, (None, None)
+        else:
+            # print("best insert position:", best_vehicle.car_num, best_position)
+            return min_cost, best_vehicle.car_num, best_position
+
+
+def vehicle_best_insertion(vehicle, order, evaluator):
+    """
+    寻找 order 在 vehicle 中的最佳插入位置
+    Only the positions respecting the capacity and the LIFO order are tried (same as model.can_add_order).
+    :return: (cost, (pick_up_i, delivery_j)), (inf, (None, None)) if there is no feasible position
     """
     min_cost = float('inf')
     best_position = (None, None)
-    best_vehicle = None
-    model = copy.deepcopy(model)
-    # 优先插入空车
-    for car_num, vehicle in model.vehicle_dict.items():
-        if vehicle.status == 'IDLE' or not vehicle.assignment_list:
-            return vehicle.car_num, (0, 0)
-    # 尝试在每辆车的每个位置尝试插入
-    for car_num, vehicle in model.vehicle_dict.items():
-        for pick_up_i in range(len(vehicle.assignment_list)+1):
-            for delivery_j in range(pick_up_i, len(vehicle.assignment_list)+1):
-                # print("try insert order", order.order_id, "to car", car_num, "at position", pick_up_i, delivery_j)
-                if not model.can_add_order(car_num, order, pick_up_i, delivery_j):
-                    # print("insert position not feasible")
-                    continue
-                vehicle.add_order(order, pick_up_i, delivery_j)
-                distance, delay = model.total_cost()
-                cost = distance + lmbda * delay
-                # print(f"distance({distance}) + lmbda * delay({delay}) = {cost}")
-                if cost < min_cost:
-                    min_cost = cost
-                    best_position = (pick_up_i, delivery_j)
-                    best_vehicle = vehicle
-                vehicle.remove_order(order)
-    if best_vehicle is None:
-        # print("No feasible position found for order", order.order_id)
-        return None, (None, None)
-    else:
-        # print("best insert position:", best_vehicle.car_num, best_position)
-        return best_vehicle.car_num, best_position
+    for pick_up_i, delivery_j in evaluator.schedule(vehicle).candidates(order.demand, vehicle.capacity):
+        cost = evaluator.cost(vehicle, order, pick_up_i, delivery_j)
+        if cost < min_cost:
+            min_cost = cost
+            best_position = (pick_up_i, delivery_j)
+    return min_cost, best_position
 
+
+def cached_best_insertion(cache, vehicle, order, evaluator):
+    """
+    vehicle_best_insertion() memoized in cache until the version of the vehicle changes
+    :param cache: dict (id(order), car_num): (Vehicle.version, cost, position)
+    """
+    entry = cache.get((id(order), vehicle.car_num))
+    if entry is None or entry[0] != vehicle.version:
+        entry = cache[(id(order), vehicle.car_num)] = (vehicle.version, *vehicle_best_insertion(vehicle, order, evaluator))
+    return entry[1], entry[2]
+
+
+def nearest_candidates(model, order, index, k):
+    """
+    Vehicles to try for order: the idle vehicles and the k vehicles whose plan passes nearest to the order
+    :param index: SpatialIndex with the footprints of the vehicles of the model
+    :return: list of car_num, in the order of model.vehicle_dict
+    """
+    nearest = index.nearest_vehicles(order.pickup_id, order.delivery_id, k)
+    return [car_num for car_num, vehicle in model.vehicle_dict.items()
+            if car_num in nearest or vehicle.status == Status.IDLE or not vehicle.assignment_list]
+
+
+def cheap_insertion(model, order):
+    """
+    Append order at the end of the plan of the vehicle that would reach the pick-up first
+    (end of its plan, without the waiting at the ports, plus the drive to the pick-up),
+    preferring the vehicles with room for the order at the end of their plan.
+    The vehicles with a long plan are free late: the orders placed this way are spread over the fleet
+    instead of all extending the plan ending nearest to them, which would make the later insertions slower.
+    No position is searched: used when there is no time (or no feasible position) for best_insertion.
+    :return: (car_num, (pick_up_i, delivery_j)) of Vehicle.add_order
+    """
+    evaluator = InsertionEvaluator(model.route)
+    best_key, best_car_num, best_position = None, None, (0, 0)
+    for car_num, vehicle in model.vehicle_dict.items():
+        end, now = evaluator.start_state(vehicle)
+        load = sum(cargo.demand for cargo in cargo_after_current(vehicle))
+        for factory_id, planned, operation in vehicle.assignment_list:
+            now += leg_time(model.route, end, factory_id) + service_time(planned, operation)
+            end = factory_id
+            load += planned.demand if operation == Operation.PICK_UP else -planned.demand
+        key = (load + order.demand > vehicle.capacity, now + leg_time(model.route, end, order.pickup_id))
+        if best_key is None or key < best_key:
+            n = len(vehicle.assignment_list)
+            best_key, best_car_num, best_position = key, car_num, (n, n)
+    return best_car_num, best_position
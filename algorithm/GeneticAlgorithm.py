@@ -1,4 +1,281 @@
+import os
+import time
+
+import numpy as np
+
+from algorithm.BasicMethod import cheap_insertion
+from algorithm.InsertionEvaluator import InsertionEvaluator, RouteSchedule, cargo_after_current
+from algorithm.TabuSearchAlgorithm import inserted
+from algorithm.TimeBudget import TimeBudget
+from algorithm.WorkerPool import WorkerPool, load_snapshot, worker_route
+
+
+def _evaluate(path, snapshot_id, chromosomes, lmbda, seconds):
+    """
+    decode() the chromosomes against the snapshot of the current slice, loaded once per worker and per slice
+    :param seconds: time left in the budget of the slice, None if there is no budget
+    """
+    snapshot = load_snapshot(path, snapshot_id)
+    evaluator = InsertionEvaluator(worker_route(), lmbda)
+    budget = TimeBudget(seconds)
+    return [decode(chromosome, snapshot, evaluator, budget) for chromosome in chromosomes]
+
+
+def decode(chromosome, snapshot, evaluator, budget: TimeBudget = None):
+    """
+    Insert the orders of the snapshot into the plans of the vehicles as described by the chromosome
+    :param chromosome: integer array of length 2m, m = number of orders:
+                       chromosome[k] is the index of the vehicle of the order k,
+                       chromosome[m:] is the permutation of the orders giving the order of the insertions,
+                       each order being inserted at the best feasible position of its vehicle
+    :param snapshot: (vehicles, orders), vehicles is a list of (car_num, capacity, start location, start time,
+                     cargo, assignment_list)
+    :param evaluator: InsertionEvaluator
+    :param budget: TimeBudget, the orders not inserted when it expires are left out of the insertions
+    :return: (extra cost of the plans, [(vehicle index, order index, pickup_position, delivery_position)]),
+             the cost is inf if an order has no feasible position, the order is then left out of the insertions
+    """
+    vehicles, orders = snapshot
+    m = len(orders)
+    schedules = {} # vehicle index: RouteSchedule of the changed plan
+    insertions = []
+    cost = 0
+    for k in chromosome[m:]:
+        if budget is not None and budget.expired():
+            cost = float('inf')
+            break
+        v = chromosome[k]
+        car_num, capacity, start_location, start_time, cargo, plan = vehicles[v]
+        schedule = schedules.get(v)
+        if schedule is None:
+            schedule = RouteSchedule(start_location, start_time, plan, evaluator.route, cargo)
+            cost -= schedule.distance + evaluator.lmbda * schedule.delay
+        order = orders[k]
+        best = (float('inf'), None)
+        for p, d in schedule.candidates(order.demand, capacity):
+            distance, delay = evaluator.schedule_insertion_cost(schedule, order, p, d)
+            if distance + evaluator.lmbda * delay < best[0]:
+                best = (distance + evaluator.lmbda * delay, (p, d))
+        if best[1] is None:
+            cost = float('inf')
+            continue
+        p, d = best[1]
+        schedules[v] = RouteSchedule(start_location, start_time, inserted(schedule.stops, order, p, d),
+                                     evaluator.route, cargo)
+        insertions.append((v, int(k), p, d))
+    for schedule in schedules.values():
+        cost += schedule.distance + evaluator.lmbda * schedule.delay
+    return cost, insertions
+
+
 class Genetic:
+    """
+    Genetic: \n
+    Genetic algorithm over the assignment of the orders of a slice to the vehicles and the order of their insertion.
+    The chromosome is an integer array (see decode()), the population starts from the greedy assignment
+    and its mutations. Each generation keeps the elite, then breeds the others by tournament selection,
+    uniform crossover of the vehicles, order crossover of the permutation and mutation.
+    The fitness is the extra cost (distance + lmbda * delay, without the ports) of the plans;
+    it is cached by chromosome, and the new chromosomes of a generation are evaluated in a process pool
+    whose workers share a read-only memory map of the route matrices.
+    Parameters:
+        - lmbda: weight of the delay in the cost, 1 by default
+        - time_limit: wall-clock budget of the search per slice in seconds, 1 by default
+        - generations: maximum number of generations, 100 by default
+        - population: size of the population, 30 by default
+        - elite: number of the best chromosomes kept as they are, 2 by default
+        - mutation: probability of mutating a gene, 0.05 by default
+        - workers: number of worker processes evaluating the population, serial if 0 or 1 (default)
+    """
+    _pool = None # WorkerPool kept between the slices
+
     @classmethod
-    def solve(cls):
-        pass
\ No newline at end of file
+    def solve(cls, model, order_list, parameters: dict = None, seed: int = 0, budget: TimeBudget = None) -> tuple:
+        """
+        Dispatch every order of order_list into the model.
+        :param model:
+        :param order_list:
+        :param parameters: {'lmbda': ..., 'time_limit': ..., 'generations': ..., 'population': ..., 'elite': ...,
+                            'mutation': ..., 'workers': ...}
+        :param seed: random seed
+        :param budget: TimeBudget of the slice, checked before each vehicle of the snapshot and of the greedy insertion,
+                       then between two orders of a decoding and between two generations; once it expires
+                       the search stops and the orders not inserted yet are placed by cheap_insertion()
+        :return: (extra cost of the greedy assignment, extra cost of the best assignment found)
+        """
+        if parameters is None:
+            parameters = {}
+        if budget is None:
+            budget = TimeBudget()
+        lmbda = parameters.get('lmbda', 1)
+        deadline = time.perf_counter() + parameters.get('time_limit', 1)
+        generations = parameters.get('generations', 100)
+        size = max(2, parameters.get('population', 30))
+        elite = min(size, parameters.get('elite', 2))
+        mutation = parameters.get('mutation', 0.05)
+        workers = parameters.get('workers', 0)
+        rng = np.random.default_rng(seed)
+        orders = list(order_list)
+        if not orders:
+            return 0, 0
+        m = len(orders)
+        car_nums = list(model.vehicle_dict.keys())
+        evaluator = InsertionEvaluator(model.route, lmbda, profiler=model.profiler)
+        vehicles = []
+        for car_num, vehicle in model.vehicle_dict.items():
+            if budget.expired():
+                # 时间用完: 所有订单由 cheap_insertion 插入
+                for order in orders:
+                    car_num, (p, d) = cheap_insertion(model, order)
+                    model.vehicle_dict[car_num].add_order(order, p, d)
+                    budget.fallbacks += 1
+                return float('inf'), float('inf')
+            vehicles.append((car_num, vehicle.capacity, *evaluator.start_state(vehicle), cargo_after_current(vehicle),
+                             list(vehicle.assignment_list)))
+        snapshot = (vehicles, orders)
+
+        cache = {} # chromosome bytes: fitness
+        best = [float('inf'), None] # fitness and insertions of the best chromosome
+        path = None
+        try:
+            if workers > 1:
+                pool = cls._pool = WorkerPool.get(cls._pool, workers, model.route)
+                path, snapshot_id = pool.snapshot(snapshot, prefix='dpdptw_genetic_')
+
+            def fitness(population):
+                new = list({chromosome.tobytes(): chromosome for chromosome in population
+                            if chromosome.tobytes() not in cache}.values())
+                if workers > 1 and len(new) > 1:
+                    seconds = budget.remaining() if budget.seconds is not None else None
+                    shards = [new[k::workers] for k in range(workers) if new[k::workers]]
+                    futures = [pool.submit(_evaluate, path, snapshot_id, shard, lmbda, seconds) for shard in shards]
+                    results = [result for future in futures for result in future.result()]
+                    new = [chromosome for shard in shards for chromosome in shard]
+                else:
+                    results = [decode(chromosome, snapshot, evaluator, budget) for chromosome in new]
+                # 只保留最优染色体的插入位置, 结束时不必重新解码
+                for chromosome, (value, insertions) in zip(new, results):
+                    cache[chromosome.tobytes()] = value
+                    if value < best[0]:
+                        best[:] = value, insertions
+                return np.array([cache[chromosome.tobytes()] for chromosome in population])
+            fitness = model.profiler.timed('genetic_fitness', fitness)
+
+            with model.profiler.phase('genetic_greedy'):
+                greedy, greedy_insertions = cls._greedy(snapshot, evaluator, budget)
+            population = [greedy]
+            scores = np.array([float('inf')])
+            if not budget.expired():
+                population += [cls._mutate(greedy, len(car_nums), max(mutation, 1 / m), rng) for _ in range(size - 1)]
+                scores = fitness(population)
+            initial = scores[0]
+            with model.profiler.phase('genetic_search'):
+                for _ in range(generations):
+                    if time.perf_counter() >= deadline or budget.expired():
+                        break
+                    ranking = np.argsort(scores, kind='stable')
+                    children = [population[i] for i in ranking[:elite]]
+                    while len(children) < size:
+                        parent_a = population[cls._tournament(scores, rng)]
+                        parent_b = population[cls._tournament(scores, rng)]
+                        child = cls._crossover(parent_a, parent_b, m, rng)
+                        children.append(cls._mutate(child, len(car_nums), mutation, rng))
+                    population = children
+                    scores = fitness(population)
+        finally:
+            if path is not None:
+                os.remove(path)
+
+        cost, insertions = best
+        if insertions is None:
+            # 没有评估过可行的染色体: 使用贪心插入的结果
+            insertions = greedy_insertions
+        # 没有可行位置或没有时间插入的订单
+        done = set()
+        for v, k, p, d in insertions:
+            model.vehicle_dict[car_nums[v]].add_order(orders[k], p, d)
+            done.add(k)
+        for k in range(m):
+            if k not in done:
+                car_num, (p, d) = cheap_insertion(model, orders[k])
+                model.vehicle_dict[car_num].add_order(orders[k], p, d)
+                budget.fallbacks += 1
+        # 子进程中的评估不计入
+        model.profiler.count('candidates', evaluator.evaluations)
+        return initial, cost
+
+    @classmethod
+    def _greedy(cls, snapshot, evaluator, budget: TimeBudget) -> tuple:
+        """
+        Chromosome of the greedy insertion: the orders in their order, each to the vehicle of the cheapest insertion
+        (the orders left when the budget expires go to the first vehicle).
+        The budget is checked before each vehicle, the schedule of a vehicle is built when it is first evaluated.
+        :return: (chromosome, insertions as returned by decode())
+        """
+        vehicles, orders = snapshot
+        m = len(orders)
+        chromosome = np.zeros(2 * m, dtype=np.int32)
+        chromosome[m:] = np.arange(m)
+        schedules = [None] * len(vehicles) # RouteSchedule of each vehicle, None until it is evaluated
+        insertions = []
+        for k, order in enumerate(orders):
+            best = (float('inf'), 0, None)
+            for v, (car_num, capacity, start_location, start_time, cargo, plan) in enumerate(vehicles):
+                if budget.expired():
+                    return chromosome, insertions
+                if schedules[v] is None:
+                    schedules[v] = RouteSchedule(start_location, start_time, plan, evaluator.route, cargo)
+                for p, d in schedules[v].candidates(order.demand, capacity):
+                    distance, delay = evaluator.schedule_insertion_cost(schedules[v], order, p, d)
+                    if distance + evaluator.lmbda * delay < best[0]:
+                        best = (distance + evaluator.lmbda * delay, v, (p, d))
+            chromosome[k] = best[1]
+            if best[2] is not None:
+                insertions.append((best[1], k, *best[2]))
+                car_num, capacity, start_location, start_time, cargo, plan = vehicles[best[1]]
+                schedules[best[1]] = RouteSchedule(start_location, start_time,
+                                                   inserted(schedules[best[1]].stops, order, *best[2]),
+                                                   evaluator.route, cargo)
+        return chromosome, insertions
+
+    @staticmethod
+    def _tournament(scores, rng, k=2) -> int:
+        candidates = rng.integers(len(scores), size=k)
+        return int(candidates[np.argmin(scores[candidates])])
+
+    @staticmethod
+    def _crossover(parent_a, parent_b, m, rng) -> np.ndarray:
+        """
+        Uniform crossover of the vehicles and order crossover (OX) of the permutations
+        """
+        child = np.empty_like(parent_a)
+        mask = rng.random(m) < 0.5
+        child[:m] = np.where(mask, parent_a[:m], parent_b[:m])
+        i, j = sorted(rng.integers(m + 1, size=2))
+        kept = parent_a[m + i:m + j]
+        rest = parent_b[m:][~np.isin(parent_b[m:], kept)]
+        child[m:] = np.concatenate([rest[:i], kept, rest[i:]])
+        return child
+
+    @staticmethod
+    def _mutate(chromosome, vehicles, rate, rng) -> np.ndarray:
+        """
+        Move each order to a random vehicle with probability rate, and swap two orders of the permutation
+        """
+        m = len(chromosome) // 2
+        child = chromosome.copy()
+        genes = rng.random(m) < rate
+        child[:m][genes] = rng.integers(vehicles, size=int(genes.sum()))
+        if m > 1 and rng.random() < rate * m:
+            i, j = rng.integers(m, size=2)
+            child[m + i], child[m + j] = child[m + j], child[m + i]
+        return child
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stop the worker processes and remove the shared route matrices
+        """
+        if cls._pool is not None:
+            cls._pool.shutdown()
+            cls._pool = None
@@ -1,30 +1,192 @@
-from algorithm.BasicMethod import find_best_insert_vehicle_position
-import random
+import numpy as np
+
+from algorithm.BasicMethod import best_insertion, cached_best_insertion, cheap_insertion, nearest_candidates
+from algorithm.InsertionEvaluator import InsertionEvaluator
+from algorithm.ParallelEvaluator import ParallelInsertion
+from algorithm.TimeBudget import TimeBudget
+from model.SpatialIndex import SpatialIndex
 
 class GreedyAlgorithm:
     """
     GreedyAlgorithm: \n
     For each new order, distribute it to minimize the total cost.
+    Parameters:
+        - lmbda: weight of the delay in the cost, 1 by default
+        - workers: number of worker processes evaluating the vehicles in parallel, serial if 0 or 1 (default)
+        - nearest: only evaluate the idle vehicles and the nearest vehicles whose plan passes near the order
+                   (at least nearest of them), all vehicles if 0 (default) or if none of them is feasible.
+                   Needs the factories of the model, serial mode only.
+        - regret: insert the orders of the slice by regret-k instead of in their order, off if 0 (default).
+                  The best insertion cost of every pending order in every vehicle is kept in a matrix;
+                  the order with the largest regret (sum of the differences between its k best vehicles
+                  and its best one) is inserted first, then only the column of the vehicle that received it
+                  is evaluated again. Serial mode only; with nearest, the matrix only holds the candidate vehicles
+                  of each order, all vehicles are evaluated for an order none of them can take.
+        - queuing: add to the insertion cost the waiting predicted at the ports of the pick-up and the delivery
+                   from the first free time of the ports of the factories, off by default. Serial mode only.
     """
+    _parallel = None # ParallelInsertion kept between the slices
+    _spatial = None # SpatialIndex of the last factory_dict
+
     def __init__(self):
         pass
 
     @classmethod
-    def dispatch(cls, model, order_list):
+    def dispatch(cls, model, order_list, parameters: dict = None, seed: int = 0, budget: TimeBudget = None):
         """
         Dispatch every order in the order_dict into the model.
         :param model:
         :param order_list:
+        :param parameters: {'lmbda': ..., 'workers': ..., 'nearest': ..., 'regret': ..., 'queuing': ...}
+        :param seed: unused, the dispatch is deterministic
+        :param budget: TimeBudget of the slice, once expired the remaining orders are placed by cheap_insertion()
         :return:
         """
-        for order in order_list:
-            # Find the best vehicle for the order
-            best_vehicle_num, best_position = find_best_insert_vehicle_position(model, order)
-            # print(f"best_vehicle_num: {best_vehicle_num}, best_position: {best_position}")
-            # Insert the order into the best vehicle
+        if parameters is None:
+            parameters = {}
+        if budget is None:
+            budget = TimeBudget()
+        lmbda = parameters.get('lmbda', 1)
+        workers = parameters.get('workers', 0)
+        nearest = parameters.get('nearest', 0)
+        regret = parameters.get('regret', 0)
+        factory_dict = model.factory_dict if parameters.get('queuing', False) else None
+
+        def insert(model, order, best_vehicle_num, best_position):
+            # Insert the order into the best vehicle, or at the end of a nearby plan if there is none
             if best_vehicle_num is None:
-                random_car_num = random.choice(list(model.vehicle_dict.keys()))
-                model.vehicle_dict[random_car_num].add_order(order, 0, 0)
-            else:
-                model.vehicle_dict[best_vehicle_num].add_order(order, best_position[0], best_position[1])
-            # print(f"best_vehicle.assignment_list{model.vehicle_dict[best_vehicle_num].assignment_list}")
+                best_vehicle_num, best_position = cheap_insertion(model, order)
+                budget.fallbacks += 1
+            model.vehicle_dict[best_vehicle_num].add_order(order, best_position[0], best_position[1])
+            return best_vehicle_num, best_position
+
+        if workers > 1:
+            if cls._parallel is None or cls._parallel.workers != workers:
+                cls.shutdown()
+                cls._parallel = ParallelInsertion(workers)
+            with model.profiler.phase('parallel_insertion'):
+                cls._parallel.dispatch(model, order_list, insert, lmbda, budget)
+            return
+
+        index = None
+        if nearest > 0 and model.factory_dict:
+            index = cls.spatial_index(model.factory_dict)
+            index.update_all(model.vehicle_dict)
+        evaluator = InsertionEvaluator(model.route, lmbda, factory_dict, model.profiler)
+        if regret > 0:
+            with model.profiler.phase('regret'):
+                cls._regret(model, order_list, evaluator, regret, insert, budget, index, nearest)
+            model.profiler.count('candidates', evaluator.evaluations)
+            return
+        cache = {} # (order, car_num): best insertion of the order in the vehicle, see best_insertion
+        with model.profiler.phase('greedy'):
+            for order in order_list:
+                if budget.expired():
+                    insert(model, order, None, (None, None))
+                    continue
+                # Find the best vehicle for the order
+                if index is not None:
+                    cost, best_vehicle_num, best_position = best_insertion(
+                        model, order, evaluator, nearest_candidates(model, order, index, nearest), cache)
+                    if best_vehicle_num is None:
+                        # 附近没有可行的车辆, 搜索所有车辆
+                        cost, best_vehicle_num, best_position = best_insertion(model, order, evaluator, cache=cache)
+                else:
+                    cost, best_vehicle_num, best_position = best_insertion(model, order, evaluator, cache=cache)
+                best_vehicle_num, best_position = insert(model, order, best_vehicle_num, best_position)
+                if index is not None:
+                    index.update(model.vehicle_dict[best_vehicle_num])
+        model.profiler.count('candidates', evaluator.evaluations)
+
+    @classmethod
+    def _regret(cls, model, order_list, evaluator, k, insert, budget, index=None, nearest=0):
+        """
+        Regret-k insertion of the orders of order_list, see the parameter regret
+        :param index: SpatialIndex restricting the vehicles of each order to nearest_candidates(), None for all
+        The budget is checked before each cell of the matrix: once it expires, the matrix is no longer filled
+        and the orders still pending are placed by cheap_insertion().
+        """
+        orders = list(order_list)
+        car_nums = list(model.vehicle_dict.keys())
+        vehicles = list(model.vehicle_dict.values())
+        cache = {}
+        costs = np.full((len(orders), len(vehicles)), np.inf) # costs[i, j]: best insertion of orders[i] in vehicles[j]
+        allowed = np.ones((len(orders), len(vehicles)), dtype=bool) # vehicles evaluated for each order
+        pending = np.ones(len(orders), dtype=bool)
+
+        def evaluate(i):
+            """
+            Fill the row of orders[i], False if the budget expired before all its vehicles were evaluated
+            """
+            for j in np.flatnonzero(allowed[i]):
+                if budget.expired():
+                    return False
+                costs[i, j] = cached_best_insertion(cache, vehicles[j], orders[i], evaluator)[0]
+            if index is not None and not np.isfinite(costs[i]).any() and not allowed[i].all():
+                # 附近没有可行的车辆, 评估所有车辆
+                allowed[i] = True
+                return evaluate(i)
+            return True
+
+        filled = 0
+        for i, order in enumerate(orders):
+            if index is not None:
+                candidates = set(nearest_candidates(model, order, index, nearest))
+                allowed[i] = [car_num in candidates for car_num in car_nums]
+            if not evaluate(i):
+                break
+            filled += 1
+        # 时间用完时尚未评估的订单
+        for i in range(filled, len(orders)):
+            insert(model, orders[i], None, (None, None))
+            pending[i] = False
+
+        k = min(k, len(vehicles))
+        while pending.any():
+            rows = np.flatnonzero(pending)
+            if budget.expired():
+                for i in rows:
+                    insert(model, orders[i], None, (None, None))
+                break
+            best_k = np.sort(costs[rows], axis=1)[:, :k]
+            best = best_k[:, 0]
+            with np.errstate(invalid='ignore'):
+                regrets = (best_k[:, 1:] - best[:, None]).sum(axis=1)
+            # 可行车辆少于k辆的订单遗憾值为inf, 优先插入; 没有可行车辆的订单最后插入
+            regrets[~np.isfinite(best)] = -np.inf
+            i = rows[np.lexsort((best, -regrets))[0]]
+            if not np.isfinite(costs[i]).any():
+                insert(model, orders[i], None, (None, None))
+                pending[i] = False
+                continue
+            j = int(np.argmin(costs[i]))
+            cost, position = cached_best_insertion(cache, vehicles[j], orders[i], evaluator)
+            insert(model, orders[i], car_nums[j], position)
+            pending[i] = False
+            if index is not None:
+                index.update(vehicles[j])
+            # 只更新插入订单的车辆这一列, 时间用完时停止 (剩余订单在下一轮由 cheap_insertion 插入)
+            for r in np.flatnonzero(pending & allowed[:, j]):
+                if budget.expired():
+                    break
+                costs[r, j] = cached_best_insertion(cache, vehicles[j], orders[r], evaluator)[0]
+                if not np.isfinite(costs[r]).any():
+                    evaluate(r)
+
+    @classmethod
+    def spatial_index(cls, factory_dict) -> SpatialIndex:
+        """
+        SpatialIndex of the factories, built once per factory_dict
+        """
+        if cls._spatial is None or cls._spatial[0] is not factory_dict:
+            cls._spatial = (factory_dict, SpatialIndex(factory_dict))
+        return cls._spatial[1]
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stop the worker processes of the parallel mode
+        """
+        if cls._parallel is not None:
+            cls._parallel.shutdown()
+            cls._parallel = None
@@ -0,0 +1,262 @@
+from model.Operation import Operation
+from model.Status import Status
+
+
+class RouteSchedule:
+    """
+    Forward schedule of the planned stops (assignment_list) of a vehicle.\n
+    For every stop k the schedule keeps the factory, the departure time (service finished),
+    the delay of the stop and the slack, i.e. how long the stops k, k+1, ... can be postponed
+    without increasing the total delay of the vehicle.
+    It also keeps the load and the LIFO stack depth after every stop, used by candidates()
+    to enumerate only the insertion positions that respect the capacity and the LIFO order.
+    """
+    def __init__(self, start_location, start_time, stops: list, route, start_cargo: list = ()):
+        self.start_location = start_location # factory_id where the vehicle is free again, None if unknown
+        self.start_time = start_time # time when the vehicle is free again
+        self.stops = list(stops) # list of (Factory_id, Order, operation)
+        self.departure = [] # departure[k]: time when the service of stop k is finished
+        self.due = [] # due[k]: committed completion time of stop k, inf for pick-ups
+        self.slack = [] # slack[k] = min(due[i] - departure[i] for i >= k)
+        self.distance = 0 # total distance of the stops
+        self.delay = 0 # total delay of the stops
+        self.load = [] # load[k]: total demand on board after stop k
+        self.depth = [] # depth[k]: number of orders on board (LIFO stack) after stop k
+        self.lifo_valid = True # False if the stops themselves do not follow the LIFO order
+
+        location, now = start_location, start_time
+        for factory_id, order, operation in stops:
+            now += leg_time(route, location, factory_id) + service_time(order, operation)
+            self.distance += leg_distance(route, location, factory_id)
+            location = factory_id
+            self.departure.append(now)
+            self.due.append(order.committed_completion_time if operation == Operation.DELIVER else float('inf'))
+            self.delay += max(0, now - self.due[-1])
+        self.slack = [float('inf')] * (len(stops) + 1)
+        for k in range(len(stops) - 1, -1, -1):
+            self.slack[k] = min(self.slack[k + 1], self.due[k] - self.departure[k])
+
+        stack = list(start_cargo)
+        load = sum(order.demand for order in stack)
+        for factory_id, order, operation in stops:
+            if operation == Operation.PICK_UP:
+                stack.append(order)
+                load += order.demand
+            else:
+                # 卸货必须是最后装上的货物
+                if not stack or stack.pop() is not order:
+                    self.lifo_valid = False
+                load -= order.demand
+            self.load.append(load)
+            self.depth.append(len(stack))
+        self.min_load = min(self.load, default=load)
+        self.max_load = max(self.load, default=load)
+
+    def location(self, k):
+        """
+        Factory of the k-th stop, the start location of the schedule for k = -1
+        """
+        return self.start_location if k < 0 else self.stops[k][0]
+
+    def extra_delay(self, begin, end, shift):
+        """
+        Extra delay caused by postponing the stops begin, ..., end-1 by shift
+        """
+        if shift <= 0 or begin >= end or shift <= self.slack[begin]:
+            return 0
+        delay = 0
+        for k in range(begin, end):
+            lateness = self.departure[k] - self.due[k]
+            delay += max(0, lateness + shift) - max(0, lateness)
+        return delay
+
+    def candidates(self, demand, capacity):
+        """
+        Feasible (pickup_position, delivery_position) of an order of the given demand, in the order
+        pickup_position = 0, 1, ..., n-1 and delivery_position = pickup_position, ..., n-1
+        (positions of Vehicle.add_order; position n would append at the end like n-1, it is not repeated).\n
+        A pick-up position is rejected at once if the load after it leaves no room for the order,
+        the delivery positions are only enumerated inside the LIFO window of the pick-up,
+        i.e. while the orders loaded after the pick-up have not all been delivered.
+        """
+        n = len(self.stops)
+        if not self.lifo_valid or self.max_load > capacity or self.min_load + demand > capacity:
+            return
+        if n == 0:
+            yield 0, 0
+            return
+        load, depth = self.load, self.depth
+        for p in range(n):
+            if load[p] + demand > capacity:
+                continue
+            for d in range(p, n):
+                # 订单在车上时载重超限, 或卸下了订单之前装上的货物
+                if load[d] + demand > capacity or depth[d] < depth[p]:
+                    break
+                if depth[d] == depth[p]:
+                    yield p, d
+
+
+def cargo_after_current(vehicle) -> list:
+    """
+    The cargo (LIFO, last loaded at the end) of the vehicle once its current assignment is finished
+    """
+    cargo = list(vehicle.cargo)
+    if vehicle.current_assignment is not None:
+        factory_id, order, operation = vehicle.current_assignment
+        if operation == Operation.PICK_UP:
+            cargo.append(order)
+        elif cargo:
+            cargo.pop()
+    return cargo
+
+
+def leg_time(route, start_id, end_id):
+    if start_id is None or start_id == end_id:
+        return 0
+    return route.time(start_id, end_id)
+
+
+def leg_distance(route, start_id, end_id):
+    if start_id is None or start_id == end_id:
+        return 0
+    return route.distance(start_id, end_id)
+
+
+def service_time(order, operation):
+    return order.load_time if operation == Operation.PICK_UP else order.unload_time
+
+
+class InsertionEvaluator:
+    """
+    InsertionEvaluator: \n
+    Evaluate the marginal distance and delay of inserting an order into the assignment_list of a vehicle,
+    without copying the model or simulating the other vehicles.
+    The positions follow Vehicle.add_order: the pick-up is inserted after assignment_list[pickup_position]
+    and the delivery after assignment_list[delivery_position].
+    With factory_dict, the waiting at the ports of the inserted pick-up and delivery is predicted
+    from the time the ports of the factories are free (Factory.first_free_time),
+    the planned stops are scheduled without waiting.
+    """
+    def __init__(self, route, lmbda=1, factory_dict: dict = None, profiler=None):
+        """
+        :param profiler: model.Profiler, if enabled schedule() and schedule_insertion_cost() are timed as phases
+        """
+        self.route = route
+        self.lmbda = lmbda
+        self.factory_dict = factory_dict
+        self._schedules = {} # car_num: (Vehicle.version, RouteSchedule)
+        self.evaluations = 0 # number of insertions priced, see model.Profiler
+        if profiler is not None and profiler.enabled:
+            # 只在开启时替换为计时的版本, 关闭时没有额外开销
+            self.schedule = profiler.timed('schedule', self.schedule)
+            self.schedule_insertion_cost = profiler.timed('schedule_insertion_cost', self.schedule_insertion_cost)
+
+    def start_state(self, vehicle):
+        """
+        The location and the time at which the vehicle finishes its current assignment
+        :return: (factory_id, time), factory_id is None if the vehicle has not visited any factory yet
+        """
+        if vehicle.current_assignment is None:
+            return vehicle.location, vehicle.now
+        factory_id, order, operation = vehicle.current_assignment
+        # 行驶中或排队中: next_status_time 为到达或开始装卸的时间
+        if vehicle.status in (Status.PICKING_UP, Status.DELIVERING, Status.WAITING):
+            return factory_id, vehicle.next_status_time + service_time(order, operation)
+        return factory_id, vehicle.next_status_time
+
+    def schedule(self, vehicle) -> RouteSchedule:
+        """
+        Schedule of the vehicle, computed once per evaluator and per version of its assignment_list
+        """
+        entry = self._schedules.get(vehicle.car_num)
+        if entry is None or entry[0] != vehicle.version:
+            start_location, start_time = self.start_state(vehicle)
+            schedule = RouteSchedule(start_location, start_time, vehicle.assignment_list, self.route,
+                                     cargo_after_current(vehicle))
+            entry = self._schedules[vehicle.car_num] = (vehicle.version, schedule)
+        return entry[1]
+
+    def wait(self, factory_id, arrival_time):
+        """
+        Predicted waiting time at the ports of a factory for a vehicle arriving at arrival_time, 0 without factory_dict
+        """
+        if self.factory_dict is None:
+            return 0
+        factory = self.factory_dict.get(factory_id)
+        return 0 if factory is None else factory.first_free_time(arrival_time) - arrival_time
+
+    def invalidate(self, vehicle):
+        """
+        Forget the schedule of a vehicle whose assignment_list has changed
+        """
+        self._schedules.pop(vehicle.car_num, None)
+
+    def insertion_cost(self, vehicle, order, pickup_position, delivery_position):
+        """
+        Marginal cost of Vehicle.add_order(order, pickup_position, delivery_position)
+        :return: (extra distance, extra delay)
+        """
+        return self.schedule_insertion_cost(self.schedule(vehicle), order, pickup_position, delivery_position)
+
+    def schedule_insertion_cost(self, schedule, order, pickup_position, delivery_position):
+        """
+        Marginal cost of inserting order into the stops of a schedule, e.g. a plan that is not (yet) a vehicle's
+        :return: (extra distance, extra delay)
+        """
+        self.evaluations += 1
+        route = self.route
+        n = len(schedule.stops)
+        pickup_id, delivery_id = order.pickup_id, order.delivery_id
+        # 位置 n 与 n-1 都表示追加到末尾; 空任务列表时 n-1 = -1 表示从起点出发
+        pickup_position = min(pickup_position, n - 1)
+        delivery_position = min(delivery_position, n - 1)
+        before_pickup = schedule.location(pickup_position)
+        before_delivery = schedule.location(delivery_position)
+        after_pickup = schedule.stops[pickup_position + 1][0] if pickup_position + 1 < n else None
+        after_delivery = schedule.stops[delivery_position + 1][0] if delivery_position + 1 < n else None
+        start_time = schedule.start_time if pickup_position < 0 else schedule.departure[pickup_position]
+
+        if pickup_position == delivery_position:
+            # ... -> before -> P -> D -> after -> ...
+            distance = leg_distance(route, before_pickup, pickup_id) + leg_distance(route, pickup_id, delivery_id)
+            arrive_pickup = start_time + leg_time(route, before_pickup, pickup_id)
+            arrive_delivery = arrive_pickup + self.wait(pickup_id, arrive_pickup) + order.load_time + \
+                              leg_time(route, pickup_id, delivery_id)
+            finish_delivery = arrive_delivery + self.wait(delivery_id, arrive_delivery) + order.unload_time
+            shift = finish_delivery - start_time
+            if after_pickup is not None:
+                distance += leg_distance(route, delivery_id, after_pickup) - \
+                            leg_distance(route, before_pickup, after_pickup)
+                shift += leg_time(route, delivery_id, after_pickup) - leg_time(route, before_pickup, after_pickup)
+            delay = schedule.extra_delay(pickup_position + 1, n, shift)
+        else:
+            # ... -> before_pickup -> P -> after_pickup -> ... -> before_delivery -> D -> after_delivery -> ...
+            distance = leg_distance(route, before_pickup, pickup_id) + \
+                       leg_distance(route, pickup_id, after_pickup) - \
+                       leg_distance(route, before_pickup, after_pickup)
+            arrive_pickup = start_time + leg_time(route, before_pickup, pickup_id)
+            shift = leg_time(route, before_pickup, pickup_id) + self.wait(pickup_id, arrive_pickup) + \
+                    order.load_time + leg_time(route, pickup_id, after_pickup) - \
+                    leg_time(route, before_pickup, after_pickup)
+            delay = schedule.extra_delay(pickup_position + 1, delivery_position + 1, shift)
+            arrive_delivery = schedule.departure[delivery_position] + shift + \
+                              leg_time(route, before_delivery, delivery_id)
+            finish_delivery = arrive_delivery + self.wait(delivery_id, arrive_delivery) + order.unload_time
+            distance += leg_distance(route, before_delivery, delivery_id)
+            shift = finish_delivery - schedule.departure[delivery_position]
+            if after_delivery is not None:
+                distance += leg_distance(route, delivery_id, after_delivery) - \
+                            leg_distance(route, before_delivery, after_delivery)
+                shift += leg_time(route, delivery_id, after_delivery) - \
+                         leg_time(route, before_delivery, after_delivery)
+            delay += schedule.extra_delay(delivery_position + 1, n, shift)
+        delay += max(0, finish_delivery - order.committed_completion_time)
+        return distance, delay
+
+    def cost(self, vehicle, order, pickup_position, delivery_position):
+        """
+        distance + lmbda * delay of the insertion
+        """
+        distance, delay = self.insertion_cost(vehicle, order, pickup_position, delivery_position)
+        return distance + self.lmbda * delay
@@ -0,0 +1,128 @@
+import os
+import pickle
+
+from algorithm.BasicMethod import best_insertion
+from algorithm.InsertionEvaluator import InsertionEvaluator
+from algorithm.WorkerPool import WorkerPool, load_snapshot, worker_route
+from model.History import VehicleHistory
+from model.Vehicle import Vehicle
+
+
+def vehicle_state(vehicle) -> tuple:
+    """
+    Compact, picklable state of a vehicle (without route and history)
+    """
+    return (vehicle.car_num, vehicle.capacity, vehicle.operation_time, vehicle.gps_id,
+            vehicle.status, vehicle.location, vehicle.now, vehicle.next_status_time,
+            vehicle.current_assignment, list(vehicle.assignment_list), list(vehicle.cargo))
+
+
+def restore_vehicle(state, route) -> Vehicle:
+    """
+    Vehicle built from vehicle_state(), without history
+    """
+    car_num, capacity, operation_time, gps_id, status, location, now, next_status_time, \
+        current_assignment, assignment_list, cargo = state
+    vehicle = Vehicle(car_num, capacity, operation_time, gps_id)
+    vehicle.route = route
+    vehicle.history = VehicleHistory(enabled=False)
+    vehicle.status = status
+    vehicle.location = location
+    vehicle.now = now
+    vehicle.next_status_time = next_status_time
+    vehicle.current_assignment = current_assignment
+    vehicle.assignment_list = assignment_list
+    vehicle.cargo = cargo
+    return vehicle
+
+
+def _build_model(snapshot):
+    """
+    Model of the workers rebuilt from the snapshot of the slice
+    :return: [model, orders, offset of the first record of the log not read yet, number of applied insertions]
+    """
+    from model.DPDPTW import DPDPTW
+    states, orders = snapshot
+    route = worker_route()
+    model = DPDPTW(route, {state[0]: restore_vehicle(state, route) for state in states})
+    return [model, orders, 0, 0]
+
+
+def _evaluate_shard(path, snapshot_id, log_path, log_length, order_index, car_nums, lmbda):
+    """
+    Best insertion of orders[order_index] into the vehicles car_nums of the snapshot,
+    after applying the insertions (car_num, order index, pick_up_i, delivery_j) of the log file not applied yet,
+    up to the first log_length ones
+    """
+    state = load_snapshot(path, snapshot_id, _build_model)
+    model, orders, offset, applied = state
+    if applied < log_length:
+        # 日志只追加: 从上次读到的位置继续; 每个任务都关闭文件, 以便主进程在时间片结束时删除它
+        with open(log_path, 'rb') as log:
+            log.seek(offset)
+            while applied < log_length:
+                car_num, k, pick_up_i, delivery_j = pickle.load(log)
+                model.vehicle_dict[car_num].add_order(orders[k], pick_up_i, delivery_j)
+                applied += 1
+            state[2] = log.tell()
+        state[3] = applied
+    return best_insertion(model, orders[order_index], InsertionEvaluator(model.route, lmbda), car_nums)
+
+
+class ParallelInsertion:
+    """
+    ParallelInsertion: \n
+    Evaluate the insertion candidates of an order in a process pool, the vehicles being sharded across the workers.
+    The state of the vehicles and the orders of the slice are written once per slice to a snapshot file
+    that each worker loads once (see WorkerPool). The insertions made in the slice are appended to a log file;
+    a task only carries the length of the log, each worker applies the insertions it has not read yet.
+    The results are reduced to the same choice as the serial best_insertion().
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool = None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def dispatch(self, model, order_list, insert, lmbda=1, budget=None):
+        """
+        Insert every order of order_list, in order, at the best position found by the workers
+        :param model:
+        :param order_list:
+        :param insert: function(model, order, car_num, position) that inserts the order at the best position found
+                       (car_num is None if there is none) and returns the (car_num, position) actually used
+        :param lmbda: weight of the delay in the cost
+        :param budget: TimeBudget, once expired the orders are passed to insert without a vehicle
+        """
+        pool = self._pool = WorkerPool.get(self._pool, self.workers, model.route)
+        car_nums = list(model.vehicle_dict.keys())
+        rank = {car_num: i for i, car_num in enumerate(car_nums)}
+        shards = [car_nums[k::self.workers] for k in range(self.workers) if car_nums[k::self.workers]]
+        orders = list(order_list)
+
+        path, snapshot_id = pool.snapshot(([vehicle_state(vehicle) for vehicle in model.vehicle_dict.values()], orders))
+        log_path = path + '.log'
+        try:
+            with open(log_path, 'wb') as log:
+                log_length = 0
+                for k, order in enumerate(orders):
+                    if budget is not None and budget.expired():
+                        car_num, position = insert(model, order, None, (None, None))
+                    else:
+                        # 子进程按 log_length 从日志文件读取尚未应用的插入, 任务本身大小不变
+                        log.flush()
+                        futures = [pool.submit(_evaluate_shard, path, snapshot_id, log_path, log_length, k, shard,
+                                               lmbda) for shard in shards]
+                        results = [future.result() for future in futures]
+                        # 与串行搜索相同: 代价最小, 代价相同时取车辆顺序靠前者
+                        cost, car_num, position = min(results,
+                                                      key=lambda result: (result[0], rank.get(result[1], len(rank))))
+                        car_num, position = insert(model, order, car_num, position)
+                    pickle.dump((car_num, k, position[0], position[1]), log, protocol=pickle.HIGHEST_PROTOCOL)
+                    log_length += 1
+        finally:
+            os.remove(log_path)
+            os.remove(path)
@@ -1,5 +1,164 @@
-# TODO: Implement Solomon Insertion Algorithm
+import numpy as np
+
+from algorithm.BasicMethod import cheap_insertion
+from algorithm.InsertionEvaluator import InsertionEvaluator
+from algorithm.TimeBudget import TimeBudget
+
+
 class SolomonInsertAlgorithm:
+    """
+    SolomonInsertAlgorithm: \n
+    Solomon's I1 insertion heuristic for pick-up and delivery orders.
+    An order is inserted as an adjacent pair (pick-up then delivery) after a stop k of a route, with i = stop k and
+    j = stop k+1 (None at the end of the route), which always respects the LIFO order:
+        - c11 = d(i, P) + d(P, D) + d(D, j) - mu * d(i, j)
+        - c12 = push forward of j (or finish time of D at the end of the route) + lower bound of the extra delay
+        - c1 = alpha * c11 + (1 - alpha) * c12, the best insertion of an order minimizes c1
+        - c2 = lmbda * d(start of the route, P) - c1, the orders with the largest c2 are inserted first
+    c1 and c2 are computed for all unrouted orders against all insertion slots at once with NumPy arrays
+    over the Routes matrices. Each round inserts, by decreasing c2, at most one order per route,
+    then the slots of the changed routes are computed again.
+    Parameters:
+        - mu, alpha, lmbda: see above, 1.0, 0.5 and 1.0 by default
+    """
+    max_cells = 1 << 22 # orders x slots evaluated at once
+
     @classmethod
-    def dispatch(cls, model, order_list, parameters, seed):
-        pass
\ No newline at end of file
+    def dispatch(cls, model, order_list, parameters: dict = None, seed: int = 0, budget: TimeBudget = None):
+        """
+        Dispatch every order of order_list into the model.
+        :param model:
+        :param order_list:
+        :param parameters: {'mu': ..., 'alpha': ..., 'lmbda': ...}
+        :param seed: unused, the dispatch is deterministic
+        :param budget: TimeBudget of the slice, checked between two rounds,
+                       once expired the remaining orders are placed by cheap_insertion()
+        :return:
+        """
+        if parameters is None:
+            parameters = {}
+        if budget is None:
+            budget = TimeBudget()
+        mu = parameters.get('mu', 1.0)
+        alpha = parameters.get('alpha', 0.5)
+        lmbda = parameters.get('lmbda', 1.0)
+        route = model.route
+        distance, time = cls._padded_matrices(route)
+
+        orders = list(order_list)
+        pickup = route.indices(order.pickup_id for order in orders)
+        delivery = route.indices(order.delivery_id for order in orders)
+        demand = np.array([order.demand for order in orders], dtype=np.float64)
+        # 取货-送货这一段的固定时间
+        pair_time = np.array([order.load_time + order.unload_time for order in orders], dtype=np.float64) + \
+                    time[pickup, delivery]
+        due = np.array([order.committed_completion_time for order in orders], dtype=np.float64)
+        pair_distance = distance[pickup, delivery]
+
+        evaluator = InsertionEvaluator(route, profiler=model.profiler)
+        unrouted = np.arange(len(orders))
+        while len(unrouted):
+            if budget.expired():
+                for k in unrouted:
+                    car_num, (p, d) = cheap_insertion(model, orders[k])
+                    model.vehicle_dict[car_num].add_order(orders[k], p, d)
+                    budget.fallbacks += 1
+                break
+            with model.profiler.phase('solomon_slots'):
+                slots = cls._slots(model, evaluator, len(route))
+            car_nums, positions, i, j, start, departure, slack, free = slots
+            best_slot = np.empty(len(unrouted), dtype=np.intp)
+            best_c1 = np.empty(len(unrouted))
+            chunk = max(1, cls.max_cells // max(1, len(car_nums)))
+            model.profiler.count('candidates', len(unrouted) * len(car_nums))
+            with model.profiler.phase('solomon_scores'):
+                for begin in range(0, len(unrouted), chunk):
+                    rows = unrouted[begin:begin + chunk]
+                    p, d = pickup[rows, None], delivery[rows, None]
+                    c11 = distance[i, p] + pair_distance[rows, None] + distance[d, j] - mu * distance[i, j]
+                    finish = departure + time[i, p] + pair_time[rows, None]
+                    push = finish + time[d, j] - departure - time[i, j]
+                    # 软时间窗: 订单自身的延误, 以及后续任务超出 slack 的延误下界
+                    delay = np.maximum(0, finish - due[rows, None]) + np.maximum(0, push - slack)
+                    c1 = alpha * c11 + (1 - alpha) * (push + delay)
+                    c1[demand[rows, None] > free] = np.inf
+                    best_slot[begin:begin + len(rows)] = np.argmin(c1, axis=1)
+                    best_c1[begin:begin + len(rows)] = c1[np.arange(len(rows)), best_slot[begin:begin + len(rows)]]
+            c2 = lmbda * distance[start[best_slot], pickup[unrouted]] - best_c1
+            c2[~np.isfinite(best_c1)] = np.inf # 没有可行位置的订单先插入附近车辆的末尾
+
+            touched = set()
+            inserted = np.zeros(len(unrouted), dtype=bool)
+            for k in np.argsort(-c2, kind='stable'):
+                order = orders[unrouted[k]]
+                if np.isfinite(best_c1[k]):
+                    car_num, position = car_nums[best_slot[k]], (positions[best_slot[k]], positions[best_slot[k]])
+                else:
+                    car_num, position = cheap_insertion(model, order)
+                if car_num in touched:
+                    continue
+                if not np.isfinite(best_c1[k]):
+                    budget.fallbacks += 1
+                vehicle = model.vehicle_dict[car_num]
+                vehicle.add_order(order, *position)
+                evaluator.invalidate(vehicle)
+                touched.add(car_num)
+                inserted[k] = True
+            unrouted = unrouted[~inserted]
+
+    @staticmethod
+    def _padded_matrices(route):
+        """
+        Distance and time matrices with an extra row and column of zeros, index len(route) standing for
+        an unknown location (a vehicle which has not visited any factory yet) or the end of a route
+        """
+        n = len(route)
+        distance = np.zeros((n + 1, n + 1))
+        time = np.zeros((n + 1, n + 1))
+        distance[:n, :n] = route.distance_matrix
+        time[:n, :n] = route.time_matrix
+        return distance, time
+
+    @staticmethod
+    def _slots(model, evaluator, none_index):
+        """
+        Insertion slots of all vehicles, one per stop k of each route (after which the pair is inserted)
+        :return: (car_nums, positions, i, j, start, departure, slack, free) with one entry per slot:
+                 the vehicle, the position of Vehicle.add_order, the factory indices of stop k and stop k+1,
+                 the start factory of the route, the departure time of stop k, the slack of the stops after k,
+                 and the free capacity after stop k (-inf if the route itself is not feasible)
+        """
+        route = model.route
+
+        def location(factory_id):
+            return none_index if factory_id is None else route.index(factory_id)
+
+        car_nums, positions, i, j, start, departure, slack, free = [], [], [], [], [], [], [], []
+        for car_num, vehicle in model.vehicle_dict.items():
+            schedule = evaluator.schedule(vehicle)
+            start_index = location(schedule.start_location)
+            feasible = schedule.lifo_valid and schedule.max_load <= vehicle.capacity
+            n = len(schedule.stops)
+            if n == 0:
+                car_nums.append(car_num)
+                positions.append(0)
+                i.append(start_index)
+                j.append(none_index)
+                start.append(start_index)
+                departure.append(schedule.start_time)
+                slack.append(np.inf)
+                free.append(vehicle.capacity - schedule.min_load if feasible else -np.inf)
+                continue
+            stops = [location(stop[0]) for stop in schedule.stops]
+            for k in range(n):
+                car_nums.append(car_num)
+                positions.append(k)
+                i.append(stops[k])
+                j.append(stops[k + 1] if k + 1 < n else none_index)
+                start.append(start_index)
+                departure.append(schedule.departure[k])
+                slack.append(schedule.slack[k + 1])
+                free.append(vehicle.capacity - schedule.load[k] if feasible else -np.inf)
+        return (car_nums, positions, np.array(i, dtype=np.intp), np.array(j, dtype=np.intp),
+                np.array(start, dtype=np.intp), np.array(departure, dtype=np.float64),
+                np.array(slack, dtype=np.float64), np.array(free, dtype=np.float64))
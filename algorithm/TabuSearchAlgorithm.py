@@ -1,4 +1,222 @@
+import random
+import time
+
+from algorithm.InsertionEvaluator import InsertionEvaluator, RouteSchedule, cargo_after_current
+from algorithm.TimeBudget import TimeBudget
+from model.Operation import Operation
+
+
 class TabuSearch:
+    """
+    TabuSearch: \n
+    Improve the dispatched plans (assignment_list of every vehicle) by moving the orders that are not picked up yet:
+        - relocate: move the pick-up and the delivery of an order to the best position of a vehicle (or of the same one)
+        - exchange: swap two orders of different vehicles, each one inserted at its best position
+    Only the positions respecting the LIFO order and the capacity are tried (RouteSchedule.candidates).
+    A move is evaluated incrementally: the plans it changes are rescheduled without the removed order
+    and the insertions are priced with InsertionEvaluator, the other vehicles are not looked at.
+    The tabu list holds the hashes of (order_id, car_num): an order may not go back to a vehicle it has just left
+    for tenure iterations, unless the move improves the best plans found.
+    Parameters:
+        - lmbda: weight of the delay in the cost, 1 by default
+        - time_limit: wall-clock budget in seconds, 1 by default
+        - iterations: maximum number of moves, 1000 by default
+        - neighbors: number of moves sampled per iteration, 20 by default
+        - tenure: number of iterations a move stays tabu, 10 by default
+        - queuing: price the insertions with the waiting predicted at the ports (see InsertionEvaluator), off by default
+    """
     @classmethod
-    def solve(cls):
-        pass
\ No newline at end of file
+    def solve(cls, model, parameters: dict = None, seed: int = 0, budget: TimeBudget = None) -> tuple:
+        """
+        Improve the plans of the vehicles of the model in place
+        :param model:
+        :param parameters: {'lmbda': ..., 'time_limit': ..., 'iterations': ..., 'neighbors': ..., 'tenure': ...,
+                           'queuing': ...}
+        :param seed: random seed of the sampled moves
+        :param budget: TimeBudget of the slice, checked before each sampled move: once it expires the search stops
+                       and the best move found in the iteration is still applied
+        :return: (cost of the plans before, cost of the plans after), distance + lmbda * delay without the ports,
+                 (None, None) if the budget expired before the search
+        """
+        if parameters is None:
+            parameters = {}
+        if budget is None:
+            budget = TimeBudget()
+        lmbda = parameters.get('lmbda', 1)
+        deadline = time.perf_counter() + parameters.get('time_limit', 1)
+        iterations = parameters.get('iterations', 1000)
+        neighbors = parameters.get('neighbors', 20)
+        tenure = parameters.get('tenure', 10)
+        rng = random.Random(seed)
+        evaluator = InsertionEvaluator(model.route, lmbda,
+                                       model.factory_dict if parameters.get('queuing', False) else None,
+                                       model.profiler)
+        if budget.expired():
+            # 不再为所有车辆建立计划的调度
+            return None, None
+        search = _Plans(model, evaluator)
+
+        initial = best = search.total
+        best_plans = dict(search.plans)
+        tabu = {} # hash((order_id, car_num)): iteration of the move that made it tabu
+        with model.profiler.phase('tabu_search'):
+            for iteration in range(iterations):
+                if time.perf_counter() >= deadline or budget.expired():
+                    break
+                best_move = None
+                for _ in range(neighbors):
+                    # 时间用完: 保留已找到的最好的邻居
+                    if time.perf_counter() >= deadline or budget.expired():
+                        break
+                    move = search.sample(rng)
+                    if move is None:
+                        break
+                    delta, changes, arrivals = move
+                    if delta == float('inf'):
+                        continue
+                    # 禁忌: 订单回到刚离开的车辆, 除非得到更好的解
+                    if any(iteration - tabu.get(hash((order.order_id, car_num)), -tenure) < tenure
+                           for order, car_num in arrivals) and \
+                            search.total + delta >= best - 1e-9:
+                        continue
+                    if best_move is None or delta < best_move[0]:
+                        best_move = move
+                if best_move is None:
+                    continue
+                delta, changes, arrivals = best_move
+                departures = search.apply(changes)
+                for order, car_num in departures:
+                    tabu[hash((order.order_id, car_num))] = iteration
+                if search.total < best - 1e-9:
+                    best = search.total
+                    best_plans = dict(search.plans)
+
+        for car_num, plan in best_plans.items():
+            vehicle = model.vehicle_dict[car_num]
+            if plan != vehicle.assignment_list:
+                vehicle.assignment_list[:] = plan
+                vehicle.version += 1
+        model.profiler.count('candidates', evaluator.evaluations)
+        return initial, best
+
+
+class _Plans:
+    """
+    Working copy of the plans of all vehicles with their schedules and costs
+    """
+    def __init__(self, model, evaluator):
+        self.model = model
+        self.evaluator = evaluator
+        self.starts = {} # car_num: (start location, start time, cargo)
+        self.plans = {} # car_num: list of (Factory_id, Order, operation), replaced (never modified) by a move
+        self.schedules = {} # car_num: RouteSchedule of the plan
+        self.costs = {} # car_num: cost of the plan
+        self.movable = {} # car_num: orders whose pick-up and delivery are both in the plan
+        for car_num, vehicle in model.vehicle_dict.items():
+            start_location, start_time = evaluator.start_state(vehicle)
+            self.starts[car_num] = (start_location, start_time, cargo_after_current(vehicle))
+            self._set_plan(car_num, list(vehicle.assignment_list))
+        self.total = sum(self.costs.values())
+        self.car_nums = list(model.vehicle_dict.keys())
+
+    def schedule(self, car_num, plan) -> RouteSchedule:
+        start_location, start_time, cargo = self.starts[car_num]
+        return RouteSchedule(start_location, start_time, plan, self.model.route, cargo)
+
+    def cost(self, schedule) -> float:
+        return schedule.distance + self.evaluator.lmbda * schedule.delay
+
+    def _set_plan(self, car_num, plan):
+        self.plans[car_num] = plan
+        self.schedules[car_num] = self.schedule(car_num, plan)
+        self.costs[car_num] = self.cost(self.schedules[car_num])
+        picked = {id(order) for factory_id, order, operation in plan if operation == Operation.PICK_UP}
+        self.movable[car_num] = [order for factory_id, order, operation in plan
+                                 if operation == Operation.DELIVER and id(order) in picked]
+
+    def best_insertion(self, car_num, schedule, order):
+        """
+        Best feasible position of order in the plan of schedule
+        :return: (cost, (pickup_position, delivery_position)), (inf, None) if there is none
+        """
+        best = (float('inf'), None)
+        capacity = self.model.vehicle_dict[car_num].capacity
+        for p, d in schedule.candidates(order.demand, capacity):
+            distance, delay = self.evaluator.schedule_insertion_cost(schedule, order, p, d)
+            cost = distance + self.evaluator.lmbda * delay
+            if cost < best[0]:
+                best = (cost, (p, d))
+        return best
+
+    def sample(self, rng):
+        """
+        A random relocate or exchange move
+        :return: (delta, {car_num: new plan}, [(order, car_num) the order arrives in]), None if there is no movable order
+        """
+        sources = [car_num for car_num in self.car_nums if self.movable[car_num]]
+        if not sources:
+            return None
+        a = rng.choice(sources)
+        order_a = rng.choice(self.movable[a])
+        plan_a = removed(self.plans[a], order_a)
+        schedule_a = self.schedule(a, plan_a)
+        delta = self.cost(schedule_a) - self.costs[a]
+        others = [car_num for car_num in sources if car_num != a]
+        if others and rng.random() < 0.5:
+            # exchange
+            b = rng.choice(others)
+            order_b = rng.choice(self.movable[b])
+            plan_b = removed(self.plans[b], order_b)
+            schedule_b = self.schedule(b, plan_b)
+            cost_a, position_a = self.best_insertion(a, schedule_a, order_b)
+            cost_b, position_b = self.best_insertion(b, schedule_b, order_a)
+            if position_a is None or position_b is None:
+                return float('inf'), {}, []
+            delta += cost_a + cost_b + self.cost(schedule_b) - self.costs[b]
+            return delta, {a: inserted(plan_a, order_b, *position_a),
+                           b: inserted(plan_b, order_a, *position_b)}, [(order_b, a), (order_a, b)]
+        # relocate
+        b = rng.choice(self.car_nums)
+        schedule_b = schedule_a if b == a else self.schedules[b]
+        cost_b, position_b = self.best_insertion(b, schedule_b, order_a)
+        if position_b is None:
+            return float('inf'), {}, []
+        delta += cost_b
+        if b == a:
+            return delta, {a: inserted(plan_a, order_a, *position_b)}, [(order_a, a)]
+        return delta, {a: plan_a, b: inserted(self.plans[b], order_a, *position_b)}, [(order_a, b)]
+
+    def apply(self, changes: dict) -> list:
+        """
+        Replace the plans of the move
+        :return: [(order, car_num) the order has left]
+        """
+        departures = []
+        for car_num, plan in changes.items():
+            kept = {id(assignment[1]) for assignment in plan}
+            departures.extend((order, car_num) for order in self.movable[car_num] if id(order) not in kept)
+            self.total -= self.costs[car_num]
+            self._set_plan(car_num, plan)
+            self.total += self.costs[car_num]
+        return departures
+
+
+def removed(plan, order) -> list:
+    """
+    The plan without the pick-up and the delivery of order
+    """
+    return [assignment for assignment in plan if assignment[1] is not order]
+
+
+def inserted(plan, order, pickup_position, delivery_position) -> list:
+    """
+    The plan with order inserted as by Vehicle.add_order
+    """
+    plan = list(plan)
+    if not plan:
+        plan.append((order.pickup_id, order, Operation.PICK_UP))
+        plan.append((order.delivery_id, order, Operation.DELIVER))
+    else:
+        plan.insert(pickup_position + 1, (order.pickup_id, order, Operation.PICK_UP))
+        plan.insert(delivery_position + 2, (order.delivery_id, order, Operation.DELIVER))
+    return plan
@@ -0,0 +1,37 @@
+import time
+
+
+class TimeBudget:
+    """
+    Wall-clock budget of the dispatch of one slice.\n
+    The algorithms check expired() between two orders (or two rounds, generations, moves, or two vehicles while
+    filling the regret matrix of GreedyAlgorithm) and place the orders they have not placed yet
+    with BasicMethod.cheap_insertion(), counted in fallbacks.
+    A budget of None never expires.
+    """
+    def __init__(self, seconds: float = None):
+        self.seconds = seconds
+        self.start = time.perf_counter()
+        self.deadline = None if seconds is None else self.start + seconds
+        self.fallbacks = 0 # orders placed by the cheap insertion because the budget expired
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return float('inf')
+        return max(0.0, self.deadline - time.perf_counter())
+
+    def expired(self) -> bool:
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def report(self) -> dict:
+        """
+        :return: {'budget': seconds, 'used': seconds, 'fraction': used / budget (None without budget), 'fallbacks': ...}
+        """
+        used = self.elapsed()
+        return {'budget': self.seconds,
+                'used': used,
+                'fraction': used / self.seconds if self.seconds else None,
+                'fallbacks': self.fallbacks}
@@ -0,0 +1,103 @@
+import atexit
+import os
+import pickle
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+from model.Routes import Routes
+
+# 子进程状态
+_route = None
+_snapshot = None # (path, snapshot_id, object built from the snapshot file)
+
+# 所有未关闭的进程池, 程序退出时关闭
+_pools = weakref.WeakSet()
+
+
+def _init_worker(route_directory):
+    global _route
+    # 路线矩阵以只读内存映射的方式在所有子进程之间共享
+    _route = Routes.load(route_directory, mmap=True)
+
+
+def worker_route() -> Routes:
+    """
+    Routes of the WorkerPool, in a worker process
+    """
+    return _route
+
+
+def load_snapshot(path: str, snapshot_id: int, build=None):
+    """
+    Object written by WorkerPool.snapshot(), loaded once per worker and per snapshot
+    :param build: function(object) -> object kept instead of the loaded one, e.g. a model rebuilt from it
+    """
+    global _snapshot
+    if _snapshot is None or _snapshot[0] != path or _snapshot[1] != snapshot_id:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+        _snapshot = (path, snapshot_id, value if build is None else build(value))
+    return _snapshot[2]
+
+
+class WorkerPool:
+    """
+    Process pool of the parallel algorithms (GreedyAlgorithm with workers, Genetic), kept between the slices.\n
+    The route matrices are saved once to a temporary directory and memory-mapped read-only by every worker
+    (see worker_route), the state of a slice is written once to a temporary snapshot file that each worker
+    loads on its first task of the slice (see load_snapshot).
+    The pools are shut down by shutdown_all(), called at the end of DPDPTW.run and when the program exits.
+    """
+    def __init__(self, workers: int, route: Routes):
+        self.workers = workers
+        self.route = route
+        self.directory = tempfile.mkdtemp(prefix='dpdptw_route_')
+        route.save(self.directory)
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.directory,))
+        self._snapshot_id = 0
+        _pools.add(self)
+
+    def submit(self, function, *args):
+        return self.executor.submit(function, *args)
+
+    def snapshot(self, value, prefix: str = 'dpdptw_slice_') -> tuple:
+        """
+        Write value to a new snapshot file, to be removed by the caller (os.remove) at the end of the slice
+        :return: (path, snapshot_id) to pass to load_snapshot() in the workers
+        """
+        self._snapshot_id += 1
+        fd, path = tempfile.mkstemp(suffix='.pkl', prefix=prefix)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path, self._snapshot_id
+
+    def shutdown(self):
+        """
+        Stop the worker processes and remove the shared route matrices
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+        _pools.discard(self)
+
+    @classmethod
+    def get(cls, pool, workers: int, route: Routes):
+        """
+        pool if it has workers processes for route, else a new WorkerPool (pool is shut down)
+        """
+        if pool is not None and pool.executor is not None and pool.workers == workers and pool.route is route:
+            return pool
+        if pool is not None:
+            pool.shutdown()
+        return cls(workers, route)
+
+    @staticmethod
+    def shutdown_all():
+        for pool in list(_pools):
+            pool.shutdown()
+
+
+atexit.register(WorkerPool.shutdown_all)
@@ -0,0 +1,145 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from model.DPDPTW import DPDPTW
+from model.Profiler import Profiler
+from reader.Read import Read
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# 子进程共享的路线信息
+_route = None
+
+
+def _init_worker(route):
+    global _route
+    _route = route
+
+
+def _peak_memory_mb():
+    """
+    Peak resident memory of the current process in MB, None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bytes
+    return peak / 1024 / 1024 if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def run_instance(instance: str, factory_file: str, algorithm: str, parameters: dict = None, seed: int = 0,
+                 route=None, profile: str = None) -> dict:
+    """
+    Run the dispatch algorithm on one benchmark instance
+    :param instance: directory of the instance, containing the order csv and vehicle_info_*.csv
+    :param factory_file: path of factory_info.csv
+    :param algorithm: see DPDPTW.distribute_orders()
+    :param parameters: see DPDPTW.distribute_orders()
+    :param seed: see DPDPTW.distribute_orders()
+    :param route: Routes, the one shared with the worker by default
+    :param profile: directory where the Profiler report (<instance>.json) and the cProfile stats (<instance>.prof)
+                    are written, no profiling if None
+    :return: one row of the results table
+    """
+    order_file, vehicle_file = BenchmarkRunner.instance_files(instance)
+    profiler = Profiler(enabled=profile is not None)
+    if profile is not None:
+        profiler.start_cprofile()
+    start = time.perf_counter()
+    model = DPDPTW(route=route if route is not None else _route, profiler=profiler)
+    model.read_vehicle(vehicle_file)
+    model.read_factory(factory_file)
+    with profiler.phase('read_orders'):
+        order_slices = Read.order_to_slices(order_file)
+    distance, delay = model.run(order_slices.items(), algorithm, parameters, seed)
+    wall_time = time.perf_counter() - start
+    if profile is not None:
+        name = os.path.join(profile, os.path.basename(instance))
+        profiler.stop_cprofile(name + '.prof')
+        profiler.dump(name + '.json')
+    lmbda = (parameters or {}).get('lmbda', 1)
+    return {'instance': os.path.basename(instance),
+            'orders': sum(len(order_slice) for order_slice in order_slices.values()),
+            'vehicles': len(model.vehicle_dict),
+            'distance': distance,
+            'delay': delay,
+            'objective': distance + lmbda * delay,
+            'wall_time': wall_time,
+            'peak_memory_mb': _peak_memory_mb(),
+            'events': model.event_count,
+            'events_per_second': model.event_count / wall_time if wall_time > 0 else None}
+
+
+class BenchmarkRunner:
+    """
+    Run a dispatch algorithm on every instance of the benchmark directory:\n
+        - benchmark/instance_*/ contains the order csv and vehicle_info_*.csv
+        - benchmark/factory_info.csv and benchmark/route_info.csv are shared by all instances
+    The route file is read once (see Read.route) and passed to the worker processes when they start.
+    The workers are not daemonic, so an algorithm may start its own worker processes (parameter workers > 1).
+    """
+    @classmethod
+    def instances(cls, path: str) -> list[str]:
+        """
+        读取path目录下的所有 instance_* 目录
+        :return: 按编号排序的目录路径列表
+        """
+        folders = [os.path.join(path, f) for f in os.listdir(path)
+                   if re.fullmatch(r'instance_\d+', f) and os.path.isdir(os.path.join(path, f))]
+        return sorted(folders, key=lambda folder: int(folder.rsplit('_', 1)[1]))
+
+    @classmethod
+    def instance_files(cls, instance: str) -> tuple[str, str]:
+        """
+        :return: (order file, vehicle file) of the instance directory
+        """
+        order_files, vehicle_files = [], []
+        for f in sorted(os.listdir(instance)):
+            if not f.endswith('.csv'):
+                continue
+            (vehicle_files if f.startswith('vehicle_info') else order_files).append(os.path.join(instance, f))
+        if len(order_files) != 1 or len(vehicle_files) != 1:
+            raise ValueError(f"Expected one order file and one vehicle file in '{instance}'")
+        return order_files[0], vehicle_files[0]
+
+    @classmethod
+    def run(cls, path: str, algorithm: str = "GreedyAlgorithm", parameters: dict = None, seed: int = 0,
+            processes: int = None, instances: list = None, output: str = None,
+            profile: str = None) -> pd.DataFrame:
+        """
+        Run every instance of path in a process pool
+        :param path: benchmark directory
+        :param algorithm: see DPDPTW.distribute_orders()
+        :param parameters: see DPDPTW.distribute_orders()
+        :param seed: see DPDPTW.distribute_orders()
+        :param processes: number of worker processes, os.cpu_count() by default
+        :param instances: instance numbers to run, all by default
+        :param output: csv file of the results table
+        :param profile: see run_instance(), created if needed
+        :return: the results table, one row per instance
+        """
+        folders = cls.instances(path)
+        if instances is not None:
+            folders = [folder for folder in folders if int(folder.rsplit('_', 1)[1]) in set(instances)]
+        route = Read.route(os.path.join(path, 'route_info.csv'))
+        factory_file = os.path.join(path, 'factory_info.csv')
+        if profile is not None:
+            os.makedirs(profile, exist_ok=True)
+        # 每个子进程只运行一个实例, 峰值内存按实例统计.
+        # ProcessPoolExecutor 的子进程不是 daemon, 算法 (workers > 1) 可以再启动自己的进程池
+        with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(route,),
+                                 max_tasks_per_child=1) as executor:
+            futures = [executor.submit(run_instance, folder, factory_file, algorithm, parameters, seed, None, profile)
+                       for folder in folders]
+            rows = [future.result() for future in futures]
+        results = pd.DataFrame(rows)
+        if output:
+            results.to_csv(output, index=False)
+        return results
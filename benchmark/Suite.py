@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from benchmark.Runner import BenchmarkRunner
+from model.DPDPTW import DPDPTW
+from model.Profiler import Profiler
+from reader.Read import Read
+
+
+def best_time(func, number: int = 1, repeat: int = 5) -> float:
+    """
+    Best time of repeat runs of number calls of func, in seconds per call
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / number
+
+
+def load_model(path: str, instance: int, history: bool = True) -> tuple:
+    """
+    :return: (DPDPTW model with the vehicles and factories of the instance, order slices)
+    """
+    order_file, vehicle_file = BenchmarkRunner.instance_files(os.path.join(path, f'instance_{instance}'))
+    model = DPDPTW(route=Read.route(os.path.join(path, 'route_info.csv')))
+    model.read_vehicle(vehicle_file, history=history)
+    model.read_factory(os.path.join(path, 'factory_info.csv'))
+    return model, Read.order_to_slices(order_file)
+
+
+class BenchmarkSuite:
+    """
+    Micro- and macro-benchmarks of the model and of the dispatch algorithms.\n
+    Micro-benchmarks (best of several repeats, seconds per operation):
+        - routes_lookup: Routes.distance and Routes.time of a random pair of factories
+        - check_capacity, check_assignment_list: every position pair of the longest plans of a fleet in mid-run
+        - update_day: time spent in DPDPTW.update (model.Profiler phase) by a full run of an instance
+          with GreedyAlgorithm, i.e. the simulation of its day without the dispatch
+    Macro-benchmarks (one run each, see benchmark.Runner.run_instance): full dispatch and simulation of
+    the instances of 50, 300, 1000 and 4000 orders by default, one after the other, each in a new process
+    so that peak_memory_mb is the peak of the instance.
+    The results are stored as json, the metrics ending in 'seconds' or 'wall_time' are compared with a baseline.
+    """
+    micro_instance = 33 # instance of the check_* and update_day micro-benchmarks
+    macro_instances = [1, 17, 33, 57] # 50, 300, 1000 and 4000 orders
+
+    @classmethod
+    def micro(cls, path: str, repeat: int = 5) -> dict:
+        """
+        :param path: benchmark directory
+        :param repeat: repeats of each micro-benchmark, the best one is kept
+        :return: {name: {'seconds': time per operation (per day for update_day), 'operations': operations per repeat}}
+        """
+        results = {}
+        rng = random.Random(0)
+        model, order_slices = load_model(path, cls.micro_instance, history=False)
+        route = model.route
+        pairs = [(rng.choice(route.factory_ids), rng.choice(route.factory_ids)) for _ in range(10000)]
+
+        def lookup():
+            for start_id, end_id in pairs:
+                route.distance(start_id, end_id)
+                route.time(start_id, end_id)
+        results['routes_lookup'] = {'seconds': best_time(lookup, repeat=repeat) / len(pairs),
+                                    'operations': len(pairs)}
+
+        # 模拟到一半, 取任务最多的车辆
+        slices = list(order_slices.items())
+        start_time = 0
+        for end_time, order_slice in slices[:len(slices) // 2]:
+            model.add_order_list(order_slice)
+            model.distribute_orders("GreedyAlgorithm")
+            model.update(max(0, end_time - start_time))
+            start_time = max(start_time, end_time)
+        vehicles = sorted(model.vehicle_dict.values(), key=lambda vehicle: -len(vehicle.assignment_list))[:5]
+        order = slices[len(slices) // 2][1][0]
+        positions = [(vehicle, p, d) for vehicle in vehicles
+                     for p in range(len(vehicle.assignment_list)) for d in range(p, len(vehicle.assignment_list))]
+        for name in ('check_capacity', 'check_assignment_list'):
+            calls = [getattr(vehicle, name) for vehicle, p, d in positions]
+
+            def check():
+                for call, (vehicle, p, d) in zip(calls, positions):
+                    call(order, p, d)
+            results[name] = {'seconds': best_time(check, repeat=repeat) / max(1, len(positions)),
+                             'operations': len(positions)}
+
+        # 一天的模拟: 完整运行实例, 只统计 update 的时间
+        best, events = float('inf'), 0
+        for _ in range(repeat):
+            model, order_slices = load_model(path, cls.micro_instance)
+            model.profiler = Profiler(enabled=True)
+            model.run(order_slices.items(), "GreedyAlgorithm")
+            best = min(best, model.profiler.phases['update'][1])
+            events = model.event_count
+        results['update_day'] = {'seconds': best, 'operations': events}
+        return results
+
+    @classmethod
+    def macro(cls, path: str, instances: list = None, algorithm: str = "GreedyAlgorithm",
+              parameters: dict = None, seed: int = 0) -> dict:
+        """
+        :param path: benchmark directory
+        :param instances: instance numbers, macro_instances by default
+        :param algorithm: see DPDPTW.distribute_orders()
+        :param parameters: see DPDPTW.distribute_orders()
+        :param seed: see DPDPTW.distribute_orders()
+        :return: {instance: row of benchmark.Runner.run_instance}
+        """
+        if instances is None:
+            instances = cls.macro_instances
+        # 每个实例在新的子进程中依次运行: 峰值内存 (ru_maxrss) 按实例统计, 运行时间互不干扰
+        rows = BenchmarkRunner.run(path, algorithm, parameters, seed, processes=1, instances=instances)
+        return {row.pop('instance'): row for row in rows.to_dict('records')}
+
+    @classmethod
+    def run(cls, path: str, micro: bool = True, macro: bool = True, instances: list = None,
+            algorithm: str = "GreedyAlgorithm", parameters: dict = None, repeat: int = 5) -> dict:
+        """
+        Run the suite
+        :return: {'environment': {...}, 'micro': {...}, 'macro': {...}}
+        """
+        results = {'environment': {'python': sys.version.split()[0], 'platform': platform.platform(),
+                                   'algorithm': algorithm, 'parameters': parameters,
+                                   'date': time.strftime('%Y-%m-%d %H:%M:%S')}}
+        if micro:
+            results['micro'] = cls.micro(path, repeat)
+        if macro:
+            results['macro'] = cls.macro(path, instances, algorithm, parameters)
+        return results
+
+    @staticmethod
+    def timings(results: dict) -> dict:
+        """
+        Timing metrics of the results, {'micro.routes_lookup.seconds': ..., 'macro.instance_1.wall_time': ...}
+        """
+        metrics = {}
+        for section in ('micro', 'macro'):
+            for name, row in results.get(section, {}).items():
+                for key, value in row.items():
+                    if (key.endswith('seconds') or key == 'wall_time') and value is not None:
+                        metrics[f'{section}.{name}.{key}'] = value
+        return metrics
+
+    @classmethod
+    def compare(cls, results: dict, baseline: dict, tolerance: float = 0.1) -> list:
+        """
+        Timing metrics slower than the baseline by more than tolerance (relative)
+        :return: list of (metric, baseline value, value, ratio), the metrics missing from one side are ignored
+        """
+        regressions = []
+        old = cls.timings(baseline)
+        for metric, value in cls.timings(results).items():
+            if metric in old and old[metric] > 0 and value > old[metric] * (1 + tolerance):
+                regressions.append((metric, old[metric], value, value / old[metric]))
+        return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the micro- and macro-benchmarks of the model and algorithms")
+    parser.add_argument('--benchmark', default='data/benchmark', help="directory containing the instance_* folders")
+    parser.add_argument('--output', default='benchmark.json', help="json file of the results")
+    parser.add_argument('--baseline', default=None, help="json file of a previous run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="relative slowdown flagged as a regression")
+    parser.add_argument('--algorithm', default='GreedyAlgorithm', help="algorithm of the macro-benchmarks")
+    parser.add_argument('--parameters', type=json.loads, default=None, help="algorithm parameters as json")
+    parser.add_argument('--instances', type=int, nargs='*', default=None,
+                        help="instance numbers of the macro-benchmarks, 1 17 33 57 by default")
+    parser.add_argument('--repeat', type=int, default=5, help="repeats of each micro-benchmark")
+    parser.add_argument('--no-micro', dest='micro', action='store_false')
+    parser.add_argument('--no-macro', dest='macro', action='store_false')
+    args = parser.parse_args()
+
+    results = BenchmarkSuite.run(args.benchmark, args.micro, args.macro, args.instances,
+                                 args.algorithm, args.parameters, args.repeat)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps({key: results[key] for key in ('micro', 'macro') if key in results}, indent=2))
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = BenchmarkSuite.compare(results, json.load(f), args.tolerance)
+        for metric, old, new, ratio in regressions:
+            print(f"REGRESSION {metric}: {old:.6g} -> {new:.6g} ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
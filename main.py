@@ -1,4 +1,21 @@
-from reader import Read
+import argparse
+import json
+
+from benchmark.Runner import BenchmarkRunner
 
 if __name__ == '__main__':
-    pass
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run a dispatch algorithm on every benchmark instance")
+    parser.add_argument('--benchmark', default='data/benchmark', help="directory containing the instance_* folders")
+    parser.add_argument('--algorithm', default='GreedyAlgorithm', help="algorithm of DPDPTW.distribute_orders")
+    parser.add_argument('--parameters', type=json.loads, default=None, help="algorithm parameters as json")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None, help="worker processes, all cores by default")
+    parser.add_argument('--instances', type=int, nargs='*', default=None, help="instance numbers, all by default")
+    parser.add_argument('--output', default='results.csv', help="csv file of the results table")
+    parser.add_argument('--profile', default=None,
+                        help="directory of the per-instance profiler reports (json) and cProfile stats (prof)")
+    args = parser.parse_args()
+
+    results = BenchmarkRunner.run(args.benchmark, args.algorithm, args.parameters, args.seed,
+                                  args.processes, args.instances, args.output, args.profile)
+    print(results.to_string(index=False))
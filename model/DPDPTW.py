@@ -1,8 +1,19 @@
-import copy
+import heapq
 
+from algorithm.GeneticAlgorithm import Genetic
 from algorithm.GreedyAlgorithm import GreedyAlgorithm
 from algorithm.SolomonInsertionAlgorithm import SolomonInsertAlgorithm
+from algorithm.TabuSearchAlgorithm import TabuSearch
+from algorithm.TimeBudget import TimeBudget
+from algorithm.WorkerPool import WorkerPool
 from model import Routes
+from model.History import VehicleHistory
+from model.Operation import Operation
+from model.Profiler import Profiler
+from model.Rollout import rollout
+from model.Snapshot import Snapshot
+from model.Status import Status
+from model.Trace import Trace
 from reader.Read import Read
 
 
@@ -21,7 +32,9 @@ class DPDPTW:
     def __init__(self, route: Routes = None,
                  vehicle_dict: dict = None,
                  factory_dict: dict = None,
-                 order_list: list = None):
+                 order_list: list = None,
+                 trace: Trace = None,
+                 profiler: Profiler = None):
         self.route: Routes = route
         # self.total_cost = 0
         self.now = 0
@@ -34,27 +47,43 @@ class DPDPTW:
         if order_list is None: self.order_list = [] # list of Order to be distributed
         else: self.order_list = order_list
 
-    def read_route(self, route_file: str) -> Routes:
+        # structured trace of the simulation, disabled by default
+        self.trace = Trace() if trace is None else trace
+        # phase timings and counters, disabled by default
+        self.profiler = Profiler() if profiler is None else profiler
+
+        # event queue of (next_status_time, seq, car_num), next_status_time is absolute
+        self.event_queue = []
+        self._event_seq = 0
+        self.event_count = 0
+
+    def read_route(self, route_file: str, cache: bool = True) -> Routes:
         """
         Read the route file and initialize the DPDPTW model
         :param route_file: file path of the route file
+        :param cache: memory-map the binary cache of the route file, rebuilt when the file changes
         :return: True if the initialization is successful, False otherwise
         """
-        self.route = Read.route(route_file)
+        with self.profiler.phase('read_route'):
+            self.route = Read.route(route_file, cache)
         # for car_num, vehicle in self.vehicle_dict.items():
         #     vehicle.route = self.route
         return self.route
 
-    def read_vehicle(self, vehicle_file: str) -> dict:
+    def read_vehicle(self, vehicle_file: str, history_capacity: int = None, history: bool = True) -> dict:
         """
         Read the vehicle file and initialize the vehicle list
         :param vehicle_file: file path of the vehicle file
+        :param history_capacity: number of history records kept per vehicle, unbounded by default
+        :param history: record the history of the vehicles
         :return: True if the initialization is successful, False otherwise
         """
-        vehicle_list = Read.vehicle(vehicle_file)
+        with self.profiler.phase('read_vehicle'):
+            vehicle_list = Read.vehicle(vehicle_file)
         for vehicle in vehicle_list:
             self.vehicle_dict[vehicle.car_num] = vehicle
             vehicle.route = self.route
+            vehicle.history = VehicleHistory(history_capacity, history)
         return self.vehicle_dict
 
     def read_factory(self, factory_file: str) -> dict:
@@ -63,7 +92,8 @@ class DPDPTW:
         :param factory_file: file path of the factory file
         :return: True if the initialization is successful, False otherwise
         """
-        factory_list = Read.factory(factory_file)
+        with self.profiler.phase('read_factory'):
+            factory_list = Read.factory(factory_file)
         for factory in factory_list:
             self.factory_dict[factory.factory_id] = factory
         return self.factory_dict
@@ -94,73 +124,122 @@ class DPDPTW:
 
     def distribute_orders(self, algorithm: str = "GreedyAlgorithm",
                           parameters: dict = None,
-                          seed: int = 0):
+                          seed: int = 0) -> dict:
         """
         Distribute the orders in the self.order_list to the vehicles
         :param seed:
-        :param parameters:
-        :param algorithm: the algorithm to distribute the orders, either "GreedyAlgorithm" or "SolomonInsertionAlgorithm"
-        :return: None
+        :param parameters: parameters of the algorithm, and 'time_budget': wall-clock budget of the slice in seconds
+                           (None by default: no budget). When it expires the algorithm keeps what it has found
+                           and places the remaining orders by BasicMethod.cheap_insertion().
+        :param algorithm: the algorithm to distribute the orders, "GreedyAlgorithm", "SolomonInsertionAlgorithm",
+                          "TabuSearch" (GreedyAlgorithm then TabuSearch on the plans) or "GeneticAlgorithm"
+        :return: TimeBudget.report() of the slice
         """
-        if algorithm == "GreedyAlgorithm":
-            # GreedyAlgorithm.dispatch(self.order_list, self.vehicle_dict, self.factory_dict, self.route)
-            GreedyAlgorithm.dispatch(self, self.order_list)
-            # print(f"after distribute{self.vehicle_dict['V_1'].assignment_list}")
+        budget = TimeBudget((parameters or {}).get('time_budget'))
+        orders = len(self.order_list)
+        with self.profiler.phase('dispatch'):
+            if algorithm == "GreedyAlgorithm":
+                GreedyAlgorithm.dispatch(self, self.order_list, parameters, seed, budget)
 
-        elif algorithm == "SolomonInsertionAlgorithm":
-            SolomonInsertAlgorithm.dispatch(self, self.order_list, parameters, seed)
-            # TODO: implement SolomonInsertionAlgorithm
-            pass
-        else:
-            raise ValueError("Invalid algorithm name")
+            elif algorithm == "SolomonInsertionAlgorithm":
+                SolomonInsertAlgorithm.dispatch(self, self.order_list, parameters, seed, budget)
+            elif algorithm == "TabuSearch":
+                GreedyAlgorithm.dispatch(self, self.order_list, parameters, seed, budget)
+                TabuSearch.solve(self, parameters, seed, budget)
+            elif algorithm == "GeneticAlgorithm":
+                Genetic.solve(self, self.order_list, parameters, seed, budget)
+            else:
+                raise ValueError("Invalid algorithm name")
         self.order_list = []
+        report = budget.report()
+        self.trace.emit(Trace.EVENT, 'dispatch', time=self.now, algorithm=algorithm, orders=orders, **report)
+        return report
+
+    def run(self, order_slices, algorithm: str = "GreedyAlgorithm",
+            parameters: dict = None,
+            seed: int = 0):
+        """
+        Dispatch and simulate a stream of order slices, then serve all remaining orders.
+        The worker processes of the parallel algorithms are stopped at the end (WorkerPool.shutdown_all).
+        :param order_slices: iterable of (slice_end, orders), e.g. Read.order_to_slices(...).items(),
+                             Read.order_stream(...) or any local stand-in generator
+        :param algorithm: see distribute_orders()
+        :param parameters: see distribute_orders()
+        :param seed: see distribute_orders()
+        :return: (the total distance, the total delay)
+        """
+        start_time = self.now
+        for end_time, order_slice in order_slices:
+            self.profiler.begin_slice(end_time)
+            self.add_order_list(order_slice)
+            self.distribute_orders(algorithm, parameters, seed)
+            self.update(max(0, end_time - start_time))
+            start_time = max(start_time, end_time)
+        self.update(1000000)
+        # 并行算法的进程池与共享的路线文件不跨运行保留
+        WorkerPool.shutdown_all()
+        return self.total_cost()
 
     def total_cost(self):
         """
-        Calculate the total cost of the DPDPTW model
+        Calculate the total cost of the DPDPTW model, after all assigned orders are served.
+        The plans are rolled forward without copying or modifying the model (see model.Rollout.rollout).
         :return: (the total distance, the total delay)
         """
-        model = copy.deepcopy(self)
-        # step to the end of all orders
-        model.update(1000000)
-        total_cost = 0
-        total_delay = 0
-        for car_num, vehicle in model.vehicle_dict.items():
-            total_cost += vehicle.distance
-            total_delay += vehicle.delay
-        return total_cost, total_delay
+        with self.profiler.phase('total_cost'):
+            return rollout(self)
+
+    def snapshot(self) -> Snapshot:
+        """
+        Save the mutable state of the model (vehicles, ports, event queue, clock) for speculative planning,
+        the routes, orders and factories are shared, not copied.
+        :return: Snapshot to pass to restore()
+        """
+        self.profiler.count('snapshots')
+        return Snapshot(self)
+
+    def restore(self, snapshot: Snapshot):
+        """
+        Put the model back in the state saved by snapshot(), e.g. after simulating a what-if plan with update()
+        :param snapshot: returned by snapshot() on this model
+        """
+        snapshot.restore(self)
 
     def can_add_order(self, car_num, order, pick_up_position, delivery_position):
         """
         Check if the order can be added to the vehicle
         which picks up the order at the pick_up_position and delivers the order at the delivery_position of the assignmen_list
         """
-        # check if the positions are valid
-        if pick_up_position > delivery_position:
-            raise ValueError("The pick-up position should be less than or equal to the delivery position")
-        # If the vehicle is idle
-        if self.vehicle_dict[car_num].status == 'IDLE':
-            # print("can_add_order: vehicle is idle")
-            return True
-        elif not self.vehicle_dict[car_num].assignment_list:
-            return True
-        # If the vehicle is working
-        elif self.vehicle_dict[car_num].status in ['PICKING_UP', 'DELIVERING', 'LOADING','UNLOADING', 'WAITING']:
-            # check capacity
-            # if self.vehicle_dict[car_num].capacity < order.demand:
-            if not self.vehicle_dict[car_num].check_capacity(order):
-                # print("can_add_order: vehicle capacity is not enough")
-                return False
-            # check the sequence of pick-up and delivery
-            if not self.vehicle_dict[car_num].check_assignment_list(order, pick_up_position, delivery_position):
-                # print("can_add_order: the sequence of pick-up and delivery is correct")
-                return False
-            return True
+        with self.profiler.phase('can_add_order'):
+            # check if the positions are valid
+            if pick_up_position > delivery_position:
+                raise ValueError("The pick-up position should be less than or equal to the delivery position")
+            # If the vehicle is idle
+            if self.vehicle_dict[car_num].status == Status.IDLE:
+                # print("can_add_order: vehicle is idle")
+                return True
+            elif not self.vehicle_dict[car_num].assignment_list:
+                return True
+            # If the vehicle is working
+            elif self.vehicle_dict[car_num].status in (Status.PICKING_UP, Status.DELIVERING, Status.LOADING,
+                                                       Status.UNLOADING, Status.WAITING):
+                # check capacity
+                # if self.vehicle_dict[car_num].capacity < order.demand:
+                if not self.vehicle_dict[car_num].check_capacity(order, pick_up_position, delivery_position):
+                    # print("can_add_order: vehicle capacity is not enough")
+                    self.profiler.count('rejections')
+                    return False
+                # check the sequence of pick-up and delivery
+                if not self.vehicle_dict[car_num].check_assignment_list(order, pick_up_position, delivery_position):
+                    # print("can_add_order: the sequence of pick-up and delivery is correct")
+                    self.profiler.count('rejections')
+                    return False
+                return True
 
     def init_solution(self, solution_type: str, parameters: dict = None, seed: int = 0):
         """
         Initialize the solution of the DPDPTW model
-        :param solution_type: type of the solution, "GreedyAlgorithm"
+        :param solution_type: type of the solution, "GreedyAlgorithm" or "SolomonInsertionAlgorithm"
         :param parameters: parameters for the solution, including mu, alpha, lmbda, ...
         :param seed: random seed for the initialization
         :return: True if the initialization is successful, False otherwise
@@ -168,193 +247,124 @@ class DPDPTW:
         if solution_type == "SolomonInsertionAlgorithm":
             if parameters is None:
                 parameters = {'mu': 1.0, 'alpha': 0.5, 'lmbda': 1.0}
-            # TODO: implement SolomonInsertionAlgorithm
+            SolomonInsertAlgorithm.dispatch(self, self.order_list, parameters, seed)
+            self.order_list = []
 
         elif solution_type == "GreedyAlgorithm":
-            for order in self.order_list:
-                GreedyAlgorithm.dispatch(self, self.order_list)
-                self.order_list = []
-
-    def _find_least_time_step(self):
-        """
-        Find the min{vehicle.next_status_time} for all vehicles
-        :return: the least time step and the corresponding vehicle, or None if there is no vehicle available
-        """
-        min_time = float('inf')
-        min_vehicle = None
-        for car_num, vehicle in self.vehicle_dict.items():
-            # 当前无任务, 之后有任务
-            if vehicle.next_status_time is None and vehicle.assignment_list:
-                return 0.1, None
-            #
-            if vehicle.status == 'IDLE' or vehicle.next_status_time is None:
-                continue
-            elif vehicle.next_status_time < min_time:
-                min_vehicle = vehicle
-                min_time = vehicle.next_status_time
-        if min_vehicle is None:
-            return None, None
-        return min_time, min_vehicle
+            GreedyAlgorithm.dispatch(self, self.order_list, parameters, seed)
+            self.order_list = []
 
     def get_vehicle_capacity(self):
         return self.vehicle_dict
 
+    def _schedule(self, vehicle):
+        """
+        Push the next status change of the vehicle into the event queue
+        """
+        if vehicle.next_status_time is not None:
+            heapq.heappush(self.event_queue, (vehicle.next_status_time, self._event_seq, vehicle.car_num))
+            self._event_seq += 1
+
+    def _start_next_assignment(self, vehicle):
+        """
+        Leave the current location to the next assignment, or become idle if there is none
+        """
+        if not vehicle.assignment_list:
+            vehicle.status = Status.IDLE
+            vehicle.next_status_time = None
+            return
+        vehicle.current_assignment = vehicle.assignment_list.pop(0)
+        vehicle.version += 1
+        vehicle.status = Status.PICKING_UP if vehicle.current_assignment[2] == Operation.PICK_UP else Status.DELIVERING
+        # 第一个任务没有出发地点, 不计路程
+        travel_time = 0
+        if vehicle.location is not None and vehicle.location != vehicle.current_assignment[0]:
+            travel_time = vehicle.route.time(vehicle.location, vehicle.current_assignment[0])
+            vehicle.distance += vehicle.route.distance(vehicle.location, vehicle.current_assignment[0])
+        vehicle.next_status_time = vehicle.now + travel_time
+
+    def _process_event(self, vehicle):
+        """
+        Change the status of the vehicle at vehicle.next_status_time
+        :return: (action, factory_id) of the status change
+        """
+        # 1. 空闲, 有新任务: 出发
+        if vehicle.current_assignment is None:
+            self._start_next_assignment(vehicle)
+            return 'begin', vehicle.location
+        factory_id, order, operation = vehicle.current_assignment
+        service_time = order.load_time if operation == Operation.PICK_UP else order.unload_time
+        # 2. 到达, 分配货口
+        if vehicle.status in (Status.PICKING_UP, Status.DELIVERING):
+            vehicle.location = factory_id
+            vehicle.status, port = self.factory_dict[factory_id].add_vehicle(vehicle, operation, vehicle.now)
+            if vehicle.status == Status.WAITING:
+                vehicle.next_status_time = port.finish_time - service_time
+            else:
+                vehicle.next_status_time = port.finish_time
+            return 'arrive', factory_id
+        # 3. 排到货口, 开始装卸
+        elif vehicle.status == Status.WAITING:
+            vehicle.status = Status.LOADING if operation == Operation.PICK_UP else Status.UNLOADING
+            vehicle.next_status_time = vehicle.now + service_time
+            return 'begin', factory_id
+        # 4. 装卸完成, 离开
+        elif vehicle.status in (Status.LOADING, Status.UNLOADING):
+            if vehicle.status == Status.LOADING:
+                vehicle.cargo.append(order)
+                action = 'load'
+            else:
+                vehicle.cargo.pop()
+                # calculate postpone
+                vehicle.delay += max(0, vehicle.now - order.committed_completion_time)
+                action = 'unload'
+            vehicle.current_assignment = None
+            self._start_next_assignment(vehicle)
+            return action, factory_id
+
+    def _trace_event(self, vehicle, action, factory_id):
+        """
+        Emit the last status change of the vehicle to the trace
+        """
+        self.trace.emit(Trace.EVENT, action, time=vehicle.now, car_num=vehicle.car_num, factory_id=factory_id,
+                        status=vehicle.status.name, next_status_time=vehicle.next_status_time)
+        if self.trace.level >= Trace.DEBUG:
+            self.trace.emit(Trace.DEBUG, 'vehicle', **vehicle.information())
+
     def update(self, time_step:int):
         """
-        Update the DPDPTW model from now to now+time_step
+        Update the DPDPTW model from now to now+time_step.\n
+        Event driven: the vehicles are kept in a heap keyed by their next status change time (absolute),
+        only the vehicle whose event fires is processed.
         :param time_step: current time step
         :return: None
         """
-        time = time_step # 剩余时间
-        while time > 0:
-            # Find the vehicle & the least time step
-            least_step, first_vehicle = self._find_least_time_step()
-            if least_step is None:
-                step = time
-            elif least_step == 0.1:
-                step = 0
-            else:
-                step = min(least_step, time) # 本次循环移动的步长
-            # Update vehicles
+        with self.profiler.phase('update'):
+            events = self.event_count
+            end_time = self.now + time_step
+            # 空闲车辆分配到新任务, 从当前时间开始执行
             for car_num, vehicle in self.vehicle_dict.items():
-                vehicle.print_information()
-                # 下一状态时间为None, (初始状态)
-                if vehicle.next_status_time is None:
-                    # 1. 车辆没有任务
-                    if vehicle.current_assignment is None and not vehicle.assignment_list:
-                        vehicle.status = 'IDLE'
-                        vehicle.now += step
-                        # print("+++++")
-                        continue
-                    # 2. 当前无任务, 以后有任务, 进行下一个任务
-                    elif vehicle.current_assignment is None and vehicle.assignment_list:
-                        vehicle.current_assignment = vehicle.assignment_list.pop(0)
-                        vehicle.status = 'PICKING_UP' if vehicle.current_assignment[2] == 'PICK_UP' else 'DELIVERING'
-                        vehicle.next_status_time = vehicle.current_assignment[1].load_time if vehicle.status == 'PICKING_UP' else vehicle.current_assignment[1].unload_time
-                        vehicle.history_info.append(
-                            (vehicle.now, 'begin', vehicle.current_assignment[0], 'condition 2', vehicle.status, vehicle.assignment_list))
-                    # 当前有任务, 报错
-                    else:
-                        print("Error: current_assignment is not None but assignment_list is empty")
-                        raise ValueError("Error: current_assignment is not None but assignment_list is not empty")
-
-                # 3. 还没到下一个状态变化的时间
-                elif vehicle.next_status_time > step:
-                    vehicle.next_status_time -= step
-                    vehicle.now += step
+                if vehicle.next_status_time is None and vehicle.assignment_list:
+                    vehicle.now = self.now
+                    vehicle.next_status_time = self.now
+                    self._schedule(vehicle)
+            while self.event_queue and self.event_queue[0][0] <= end_time:
+                event_time, _, car_num = heapq.heappop(self.event_queue)
+                vehicle = self.vehicle_dict[car_num]
+                # 过期事件
+                if vehicle.next_status_time != event_time:
                     continue
-                # 4. 车辆空闲且没有任务
-                elif vehicle.status == 'IDLE' and not vehicle.assignment_list:
-                    vehicle.next_status_time = None
-                    vehicle.now += step
-                    continue
-                # 5. 车辆空闲但有任务, 执行最早任务
-                elif vehicle.status == 'IDLE' and vehicle.assignment_list:
-                    vehicle.current_assignment = vehicle.assignment_list.pop(0)
-                    vehicle.status = 'PICKING_UP' if vehicle.current_assignment[2] == 'PICK_UP' else 'DELIVERING'
-                    vehicle.next_status_time = vehicle.current_assignment[1].load_time if vehicle.status == 'PICKING_UP' else vehicle.current_assignment[1].unload_time
-                    vehicle.history_info.append(
-                        (vehicle.now, 'begin', vehicle.current_assignment[0], 'condition 5', vehicle.status, vehicle.assignment_list))
-                # 到达下一个状态变化的时间
-                else:
-                    # 6. 到达
-                    if vehicle.status in ['PICKING_UP', 'DELIVERING']:
-                        # 下一状态信息
-                        next_location_id = vehicle.current_assignment[0]
-                        # distribute port, update status
-                        vehicle.status, port = self.factory_dict[vehicle.current_assignment[0]].add_vehicle(vehicle,
-                                                                                         vehicle.current_assignment[2])
-                        # record
-                        vehicle.history_info.append(
-                            (vehicle.now, 'arrive', next_location_id, 'condition 6', vehicle.status, vehicle.assignment_list))
-                        # update time
-                        # time -= vehicle.next_status_time
-                        # vehicle.now += vehicle.next_status_time
-                        if port.finish_time <= vehicle.next_status_time:  # 没到就空了
-                            vehicle.next_status_time = vehicle.current_assignment[1].load_time if vehicle.status == 'PICKING_UP' else vehicle.current_assignment[1].unload_time
-                        else:  # 到时还没空
-                            vehicle.next_status_time = port.finish_time - vehicle.next_status_time + \
-                                                       vehicle.current_assignment[1].load_time if vehicle.status == 'PICKING_UP' else vehicle.current_assignment[1].unload_time
-                    # 7-1. 离开, 再无任务(完成卸货)
-                    elif vehicle.status in ['LOADING', 'UNLOADING'] and not vehicle.assignment_list:
-                        # record
-                        vehicle.history_info.append(
-                            (vehicle.now, 'unload', vehicle.current_assignment[0], 'condition 7-1', 'IDLE', vehicle.assignment_list))
-                        # update status
-                        vehicle.status = 'IDLE'
-                        vehicle.next_status_time = None
-                        # update cargo
-                        if vehicle.status == 'UNLOADING':
-                            cargo_order = vehicle.cargo.pop()
-                            # calculate postpone
-                            if cargo_order.committed_completion_time < vehicle.now:
-                                vehicle.delay += max(0, cargo_order.committed_completion_time - vehicle.now)
-                        else:
-                            cargo_order = vehicle.current_assignment[1]
-                            vehicle.cargo.append(cargo_order)
-                            # calculate postpone
-                            if cargo_order.committed_completion_time < vehicle.now:
-                                vehicle.delay += max(0, cargo_order.committed_completion_time - vehicle.now)
-                        # update assignment
-                        vehicle.current_assignment = None
-                        # update time
-                        vehicle.now += step
-                        continue
-                    # 7-2. 离开, 还有任务
-                    elif vehicle.status in ['LOADING', 'UNLOADING'] and vehicle.assignment_list:
-                        # update cargo
-                        if vehicle.status == 'UNLOADING':
-                            cargo_order = vehicle.cargo.pop()
-                            # calculate postpone
-                            if cargo_order.committed_completion_time < vehicle.now:
-                                vehicle.delay += max(0, cargo_order.committed_completion_time - vehicle.now)
-                        else:
-                            cargo_order = vehicle.current_assignment[1]
-                            vehicle.cargo.append(vehicle.current_assignment[1])
-                        # update assignment
-                        old_location_id = vehicle.current_assignment[0]
-                        vehicle.current_assignment = vehicle.assignment_list.pop(0)
-                        # update status
-                        old_status = vehicle.status
-                        vehicle.status = 'PICKING_UP' if vehicle.current_assignment[2] == 'PICK_UP' else 'DELIVERING'
-                        # record
-                        vehicle.distance += vehicle.route.distance(vehicle.current_assignment[0],
-                                                                   old_location_id)
-                        if old_status == 'LOADING':
-                            vehicle.history_info.append(
-                                (vehicle.now, 'load', vehicle.current_assignment[0], "condition 7-2", vehicle.status, vehicle.assignment_list))
-                        else:
-                            vehicle.history_info.append(
-                                (vehicle.now, 'unload', vehicle.current_assignment[0], "condition 7-2", vehicle.status, vehicle.assignment_list))
-                        # update time
-                        # time -= vehicle.next_status_time
-                        # vehicle.now += vehicle.next_status_time
-                        vehicle.next_status_time = vehicle.route.time(old_location_id,
-                                                                      vehicle.current_assignment[0])
-                    # 8. 排到
-                    elif vehicle.status == 'WAITING':
-                        # update status
-                        vehicle.status = 'LOADING' if vehicle.current_assignment[2] == 'PICK_UP' else 'UNLOADING'
-                        # record
-                        vehicle.history_info.append(
-                            (vehicle.now, 'begin', vehicle.current_assignment[0], 'condition 8', vehicle.status, vehicle.assignment_list))
-                        # update time
-                        # time -= vehicle.next_status_time
-                        # vehicle.now += vehicle.next_status_time
-
-                # update time
-                vehicle.now += step
-
+                vehicle.now = event_time
+                action, factory_id = self._process_event(vehicle)
+                vehicle.record(action, factory_id)
+                self._schedule(vehicle)
+                self.event_count += 1
+                if self.trace.level >= Trace.EVENT:
+                    self._trace_event(vehicle, action, factory_id)
+            self.now = end_time
             for car_num, vehicle in self.vehicle_dict.items():
-                vehicle.print_information()
-
-            # Update factories
-            for factory_id, factory in self.factory_dict.items():
-                # factory.update(least_step)
-                for port in factory.port_list:
-                    port.finish_time -= step if port.finish_time >= step else 0
-            time -= step
-        self.now += time_step
+                vehicle.now = end_time
+            self.profiler.count('events', self.event_count - events)
 
 if __name__ == '__main__':
     # Example usage
@@ -389,31 +399,6 @@ if __name__ == '__main__':
     #     r"D:\Project\ICAPS-2021\data\benchmark\instance_20\300_4.csv"
     # ]
 
-    order_slices = Read.order_to_slices(paths[-3])
-    print(order_slices)
-
-    # # 单次插入
-    # order_slice = order_slices[180]
-    # print(order_slice)
-    # dpdptw.add_order_list(order_slice)
-    # dpdptw.distribute_orders(algorithm='GreedyAlgorithm')
-    # print(dpdptw.vehicle_dict['V_1'].assignment_list)
-    # # print(dpdptw.factory_dict['b6dd694ae05541dba369a2a759d2c2b9'])
-    # dpdptw.update(180)
-    # # print(dpdptw.total_cost())
-
-    # 多次插入
-    start_time = 0
-    for end_time, order_slice in order_slices.items():
-        dpdptw.add_order_list(order_slice)
-        dpdptw.distribute_orders(algorithm='GreedyAlgorithm')
-        time_step = end_time - start_time
-        dpdptw.update(time_step)
-        start_time = end_time
-    # print(dpdptw.total_cost())
-    dpdptw.update(1000000)
-    distance, delay = 0, 0
-    for car_num, vehicle in dpdptw.vehicle_dict.items():
-        distance += vehicle.distance
-        delay += vehicle.delay
-    print(f"distance: {distance}, delay: {delay}")
\ No newline at end of file
+    # 流式读取订单, 边读边派单
+    distance, delay = dpdptw.run(Read.order_stream(paths[-3]), algorithm='GreedyAlgorithm')
+    print(f"distance: {distance}, delay: {delay}")
@@ -1,13 +1,24 @@
+import heapq
+import sys
+
+from model.Operation import Operation
 from model.Port import Port
+from model.Status import Status
 
 
 class Factory:
     """
-    A factory(customer) with several ports
+    A factory(customer) with several ports.\n
+    The ports are also kept in free_ports, a heap of (finish_time, port index) in absolute time:
+    the port free first is found in O(1) and updated in O(log port_num).
+    Only the time at which each port is free again is kept, not the reserved intervals:
+    the vehicles take the first free port in the order of their arrival.
     """
+    __slots__ = ('factory_id', 'longitude', 'latitude', 'port_num', 'port_list', 'free_ports')
+
     def __init__(self, factory_id, longitude, latitude, port_num):
         # 属性
-        self.factory_id = factory_id
+        self.factory_id = sys.intern(factory_id)
         self.longitude = longitude
         self.latitude = latitude
         self.port_num = port_num
@@ -15,6 +26,7 @@ class Factory:
         # ports
         # self.queue_vehicles = [] # FIFO
         self.port_list = []
+        self.free_ports = [] # heap of (finish_time, index in port_list)
         self._init_ports()
 
     def __str__(self):
@@ -27,30 +39,48 @@ class Factory:
         for i in range(self.port_num):
             port = Port()
             self.port_list.append(port)
+            self.free_ports.append((port.finish_time, i))
+        heapq.heapify(self.free_ports)
+
+    def reset_ports(self, finish_times: list):
+        """
+        Set the finish time of each port and rebuild free_ports, see model.Snapshot
+        """
+        for port, finish_time in zip(self.port_list, finish_times):
+            port.finish_time = finish_time
+        self.free_ports = [(port.finish_time, i) for i, port in enumerate(self.port_list)]
+        heapq.heapify(self.free_ports)
 
     def _find_first_port(self):
         """
-        Find the port finishing first
+        Find the port finishing first (the first one in port_list if several finish at the same time)
         """
-        min_finish_time = float('inf')
-        first_port = None
-        for port in self.port_list:
-            if port.finish_time < min_finish_time:
-                min_finish_time = port.finish_time
-                first_port = port
-        return first_port, min_finish_time
+        if not self.free_ports:
+            return None, float('inf')
+        finish_time, i = self.free_ports[0]
+        return self.port_list[i], finish_time
 
-    def add_vehicle(self, vehicle, operation):
+    def first_free_time(self, arrival_time):
         """
-        Add a vehicle to the port finishing first
+        Earliest time a port is free for a vehicle arriving at arrival_time, i.e. when its service would start
+        if it arrived now after the vehicles already assigned to the ports (later arrivals are not known)
+        """
+        if not self.free_ports:
+            return arrival_time
+        return max(arrival_time, self.free_ports[0][0])
+
+    def add_vehicle(self, vehicle, operation, now=0):
+        """
+        Add a vehicle arriving at time now to the port finishing first
+        :return: (status of the vehicle, port), the service of the vehicle ends at port.finish_time
         """
         first_port, min_finish_time = self._find_first_port()
-        if min_finish_time == 0:
-            status = 'LOADING' if operation == 'PICK_UP' else 'UNLOADING'
+        if min_finish_time <= now:
+            status = Status.LOADING if operation == Operation.PICK_UP else Status.UNLOADING
         else:
-            status = 'WAITING'
+            status = Status.WAITING
         # update port.finish_time
-        first_port.finish_time += vehicle.current_assignment[1].load_time \
-            if operation == 'PICK_UP' else vehicle.current_assignment[1].unload_time
+        first_port.finish_time = max(now, min_finish_time) + (vehicle.current_assignment[1].load_time
+            if operation == Operation.PICK_UP else vehicle.current_assignment[1].unload_time)
+        heapq.heapreplace(self.free_ports, (first_port.finish_time, self.free_ports[0][1]))
         return status, first_port
-
@@ -0,0 +1,97 @@
+from array import array
+
+from model.Status import Status
+
+ACTIONS = ['add_order', 'begin', 'arrive', 'load', 'unload']
+ACTION_CODE = {action: code for code, action in enumerate(ACTIONS)}
+
+
+class VehicleHistory:
+    """
+    Columnar log of the status changes of a vehicle.\n
+    Each record is (time, action code, factory index, Status) stored in four typed arrays,
+    the factory index is the index of the factory in Routes (-1 if unknown).
+    With a capacity only the last capacity records are kept (ring buffer).
+    A disabled history records nothing; deep copies (planning copies of the model) are disabled and empty.
+    """
+    def __init__(self, capacity: int = None, enabled: bool = True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self.time = array('d')
+        self.action = array('b')
+        self.factory = array('i')
+        self.status = array('b')
+        self._head = 0 # index of the oldest record once the ring buffer is full
+
+    def __len__(self):
+        return len(self.time)
+
+    def __deepcopy__(self, memo):
+        return VehicleHistory(self.capacity, enabled=False)
+
+    def append(self, time, action: str, factory_index: int, status: Status):
+        if not self.enabled:
+            return
+        if self.capacity is None or len(self.time) < self.capacity:
+            self.time.append(time)
+            self.action.append(ACTION_CODE[action])
+            self.factory.append(factory_index)
+            self.status.append(status)
+        elif self.capacity > 0:
+            i = self._head
+            self.time[i] = time
+            self.action[i] = ACTION_CODE[action]
+            self.factory[i] = factory_index
+            self.status[i] = status
+            self._head = (i + 1) % self.capacity
+
+    def mark(self):
+        """
+        State to rewind() to: the number of records of an unbounded history,
+        a copy of the records of a ring buffer (at most capacity records)
+        """
+        if self.capacity is None:
+            return len(self.time), None
+        return self._head, (array('d', self.time), array('b', self.action),
+                            array('i', self.factory), array('b', self.status))
+
+    def rewind(self, mark):
+        """
+        Drop the records appended since mark()
+        """
+        n, records = mark
+        if records is None:
+            del self.time[n:], self.action[n:], self.factory[n:], self.status[n:]
+        else:
+            self.time, self.action, self.factory, self.status = (array(column.typecode, column) for column in records)
+            self._head = n
+
+    def clear(self):
+        del self.time[:], self.action[:], self.factory[:], self.status[:]
+        self._head = 0
+
+    def _order(self):
+        n = len(self.time)
+        return [(self._head + k) % n for k in range(n)]
+
+    def last(self):
+        """
+        The last record decoded as (time, action, factory index, status), None if empty
+        """
+        if not self.time:
+            return None
+        i = (self._head - 1) % len(self.time)
+        return self.time[i], ACTIONS[self.action[i]], self.factory[i], Status(self.status[i])
+
+    def records(self, factory_ids: list = None) -> list:
+        """
+        All records from the oldest, decoded as (time, action, factory, status)
+        :param factory_ids: Routes.factory_ids to decode the factory indices into factory ids
+        """
+        result = []
+        for i in self._order():
+            factory = self.factory[i]
+            if factory_ids is not None:
+                factory = factory_ids[factory] if factory >= 0 else None
+            result.append((self.time[i], ACTIONS[self.action[i]], factory, Status(self.status[i])))
+        return result
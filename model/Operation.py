@@ -0,0 +1,9 @@
+from enum import IntEnum
+
+
+class Operation(IntEnum):
+    """
+    Operation of an assignment (Factory_id, Order, operation)
+    """
+    PICK_UP = 0
+    DELIVER = 1
@@ -1,7 +1,14 @@
+import sys
+
+
 class Order:
     """
     An order
     """
+    __slots__ = ('order_id', 'q_standard', 'q_small', 'q_box', 'demand',
+                 'creation_time', 'committed_completion_time', 'load_time', 'unload_time',
+                 'pickup_id', 'delivery_id')
+
     def __init__(self, order_id, q_standard, q_small, q_box, demand,
                  creation_time, committed_completion_time, load_time, unload_time,
                  pickup_id, delivery_id):
@@ -16,9 +23,9 @@ class Order:
         self.committed_completion_time	= committed_completion_time
         self.load_time = load_time
         self.unload_time = unload_time
-        # location info
-        self.pickup_id = pickup_id
-        self.delivery_id = delivery_id
+        # location info, interned: compared and hashed in every route lookup
+        self.pickup_id = sys.intern(pickup_id)
+        self.delivery_id = sys.intern(delivery_id)
 
     def __str__(self):
         return f"Order {self.order_id}"
\ No newline at end of file
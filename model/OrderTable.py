@@ -0,0 +1,76 @@
+import numpy as np
+
+from model.Order import Order
+
+COLUMNS = ['order_id', 'q_standard', 'q_small', 'q_box', 'demand',
+           'creation_time', 'committed_completion_time', 'load_time', 'unload_time',
+           'pickup_id', 'delivery_id']
+
+
+class OrderTable:
+    """
+    Columnar table of orders, one NumPy array per Order attribute.\n
+    Order objects are only created when a row is accessed, and then reused.
+    """
+    def __init__(self, columns: dict):
+        """
+        :param columns: {column name: array}, with every name of COLUMNS and arrays of the same length
+        """
+        self.columns = columns
+        self._orders = [None] * len(columns['order_id'])
+
+    def __len__(self):
+        return len(self._orders)
+
+    def order(self, i: int) -> Order:
+        """
+        The Order of the row i
+        """
+        order = self._orders[i]
+        if order is None:
+            # object columns (e.g. order_id read as str) already hold Python values
+            order = Order(*(_python_value(self.columns[name][i]) for name in COLUMNS))
+            self._orders[i] = order
+        return order
+
+
+def _python_value(value):
+    """
+    A NumPy scalar converted to the Python type, any other value unchanged
+    """
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class OrderSlice:
+    """
+    A view of the rows start, ..., stop-1 of an OrderTable, used like a list of Order
+    """
+    def __init__(self, table: OrderTable, start: int, stop: int):
+        self.table = table
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __iter__(self):
+        for i in range(self.start, self.stop):
+            yield self.table.order(i)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self.table.order(self.start + i) for i in range(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("OrderSlice index out of range")
+        return self.table.order(self.start + k)
+
+    def column(self, name: str):
+        """
+        The values of a column for the orders of the slice, without creating Order objects
+        """
+        return self.table.columns[name][self.start:self.stop]
+
+    def __repr__(self):
+        return f"OrderSlice({len(self)} orders)"
@@ -1,3 +1,5 @@
 class Port:
+    __slots__ = ('finish_time',)
+
     def __init__(self):
-        self.finish_time = 0  # time when the port is available again
+        self.finish_time = 0  # absolute time when the port is available again
@@ -0,0 +1,165 @@
+import cProfile
+import json
+import time
+
+
+class _NullPhase:
+    """
+    Phase of a disabled profiler, does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """
+    Measure the wall-clock and CPU time of a block and add them to the profiler
+    """
+    __slots__ = ('profiler', 'name', 'wall', 'cpu')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.add(self.name, time.perf_counter() - self.wall, time.process_time() - self.cpu)
+        return False
+
+
+class Profiler:
+    """
+    Opt-in profiler of the simulation and of the dispatch.\n
+    Phases are timed with "with profiler.phase(name):", the wall-clock and CPU times are summed per phase
+    for the whole run and for the current slice (see begin_slice). Counters are incremented with count().
+    A disabled profiler (the default of DPDPTW) returns a shared no-op phase and ignores the counters,
+    callers in hot loops check enabled before counting.
+    Phases (nested phases are included in their parent):
+        - read_route, read_vehicle, read_factory, read_orders: reading the data files
+        - dispatch: DPDPTW.distribute_orders
+        - greedy, regret, parallel_insertion: the serial, regret-k and parallel insertion of GreedyAlgorithm
+        - solomon_slots, solomon_scores: the insertion slots of the vehicles and the c1 scores of each round
+          of SolomonInsertAlgorithm
+        - tabu_search: the search loop of TabuSearch
+        - genetic_greedy, genetic_search: the greedy chromosome and the generations of Genetic,
+          genetic_fitness: the evaluation of the new chromosomes of a population
+        - best_insertion: algorithm.BasicMethod.best_insertion, the best vehicle of an order
+        - schedule, schedule_insertion_cost: the methods of InsertionEvaluator, timed on every call
+          (a profiled run is slower than a plain one, the disabled profiler does not wrap them)
+        - total_cost, update: the methods of DPDPTW of the same name
+        - find_best_insert_vehicle_position, can_add_order: the methods of the same name, used by the callers
+          of the model but not by the dispatch algorithms
+    Counters:
+        - candidates: insertion positions evaluated by the dispatch (in this process)
+        - rejections: vehicles without a feasible position for an order, and can_add_order returning False
+        - events: status changes processed by the simulation
+        - snapshots: copies of the model state (DPDPTW.snapshot)
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.phases = {} # name: [calls, wall-clock time, CPU time]
+        self.counters = {} # name: value
+        self.slices = [] # {'time': slice end, 'phases': {...}, 'counters': {...}} of each slice
+        self._cprofile = None
+
+    def phase(self, name: str):
+        """
+        Context manager timing the block as phase name
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add(self, name: str, wall: float, cpu: float):
+        """
+        Add a call of phase name to the run and to the current slice
+        """
+        for phases in (self.phases, self.slices[-1]['phases']) if self.slices else (self.phases,):
+            entry = phases.get(name)
+            if entry is None:
+                entry = phases[name] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += wall
+            entry[2] += cpu
+
+    def timed(self, name: str, function):
+        """
+        function wrapped to be timed as phase name on every call, function itself if the profiler is disabled.
+        For the methods called once per insertion candidate: the disabled path keeps no overhead at all.
+        """
+        if not self.enabled:
+            return function
+
+        def timed_function(*args, **kwargs):
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+        return timed_function
+
+    def count(self, name: str, n: int = 1):
+        if not self.enabled:
+            return
+        for counters in (self.counters, self.slices[-1]['counters']) if self.slices else (self.counters,):
+            counters[name] = counters.get(name, 0) + n
+
+    def begin_slice(self, time):
+        """
+        Start a new slice, the following phases and counters are also recorded for it
+        :param time: end time of the slice
+        """
+        if self.enabled:
+            self.slices.append({'time': time, 'phases': {}, 'counters': {}})
+
+    def start_cprofile(self):
+        """
+        Start a cProfile profiler, whatever enabled is
+        """
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def stop_cprofile(self, path: str = None) -> cProfile.Profile:
+        """
+        Stop the cProfile profiler started by start_cprofile()
+        :param path: file the stats are dumped to (pstats format, e.g. for snakeviz), not written if None
+        :return: the cProfile.Profile, None if it was not started
+        """
+        profile, self._cprofile = self._cprofile, None
+        if profile is not None:
+            profile.disable()
+            if path is not None:
+                profile.dump_stats(path)
+        return profile
+
+    @staticmethod
+    def _phases_report(phases: dict) -> dict:
+        return {name: {'calls': calls, 'wall': wall, 'cpu': cpu} for name, (calls, wall, cpu) in phases.items()}
+
+    def report(self) -> dict:
+        """
+        :return: {'phases': {name: {'calls', 'wall', 'cpu'}}, 'counters': {...}, 'slices': [...]}, json serializable
+        """
+        return {'phases': self._phases_report(self.phases),
+                'counters': dict(self.counters),
+                'slices': [{'time': s['time'], 'phases': self._phases_report(s['phases']),
+                            'counters': dict(s['counters'])} for s in self.slices]}
+
+    def dump(self, path: str):
+        """
+        Write report() to a json file
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
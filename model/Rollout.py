@@ -0,0 +1,95 @@
+import heapq
+
+from model.Operation import Operation
+from model.Status import Status
+
+
+def rollout(model, assignment_lists: dict = None):
+    """
+    Roll the plans of all vehicles forward until every assignment is served and return the total cost.\n
+    Same rules as DPDPTW.update (event queue, ports, delay), but the model is neither modified nor copied:
+    the vehicles and the ports are replayed on a few local variables, the routes and orders are shared.
+    :param model: DPDPTW model
+    :param assignment_lists: {car_num: assignment_list} used instead of vehicle.assignment_list, for what-if analysis
+    :return: (the total distance, the total delay)
+    """
+    route = model.route
+    vehicles = list(model.vehicle_dict.values())
+    position = {vehicle.car_num: i for i, vehicle in enumerate(vehicles)}
+    plans = [vehicle.assignment_list for vehicle in vehicles]
+    if assignment_lists:
+        for car_num, assignment_list in assignment_lists.items():
+            plans[position[car_num]] = assignment_list
+
+    # 局部状态, 与 Vehicle 的属性一一对应
+    status = [vehicle.status for vehicle in vehicles]
+    current = [vehicle.current_assignment for vehicle in vehicles]
+    location = [vehicle.location for vehicle in vehicles]
+    next_time = [vehicle.next_status_time for vehicle in vehicles]
+    cursor = [0] * len(vehicles) # index of the next assignment in plans
+    distance = [vehicle.distance for vehicle in vehicles]
+    delay = [vehicle.delay for vehicle in vehicles]
+    ports = {} # factory_id: Factory.free_ports, copied on first use
+
+    queue = [(event_time, seq, position[car_num]) for event_time, seq, car_num in model.event_queue]
+    heapq.heapify(queue)
+    seq = model._event_seq
+    for i in range(len(vehicles)):
+        if next_time[i] is None and plans[i]:
+            next_time[i] = model.now
+            heapq.heappush(queue, (model.now, seq, i))
+            seq += 1
+
+    while queue:
+        now, _, i = heapq.heappop(queue)
+        if next_time[i] != now:
+            continue
+        if current[i] is not None:
+            factory_id, order, operation = current[i]
+            service_time = order.load_time if operation == Operation.PICK_UP else order.unload_time
+        depart = False
+        # 1. 空闲, 有新任务: 出发
+        if current[i] is None:
+            depart = True
+        # 2. 到达, 分配货口
+        elif status[i] in (Status.PICKING_UP, Status.DELIVERING):
+            location[i] = factory_id
+            free_ports = ports.get(factory_id)
+            if free_ports is None:
+                free_ports = ports[factory_id] = list(model.factory_dict[factory_id].free_ports)
+            finish_time, first = free_ports[0]
+            start = max(now, finish_time)
+            heapq.heapreplace(free_ports, (start + service_time, first))
+            if start > now:
+                status[i] = Status.WAITING
+                next_time[i] = start
+            else:
+                status[i] = Status.LOADING if operation == Operation.PICK_UP else Status.UNLOADING
+                next_time[i] = start + service_time
+        # 3. 排到货口, 开始装卸
+        elif status[i] == Status.WAITING:
+            status[i] = Status.LOADING if operation == Operation.PICK_UP else Status.UNLOADING
+            next_time[i] = now + service_time
+        # 4. 装卸完成, 离开
+        else:
+            if status[i] == Status.UNLOADING:
+                delay[i] += max(0, now - order.committed_completion_time)
+            current[i] = None
+            depart = True
+
+        if depart:
+            if cursor[i] >= len(plans[i]):
+                status[i] = Status.IDLE
+                next_time[i] = None
+                continue
+            current[i] = plans[i][cursor[i]]
+            cursor[i] += 1
+            status[i] = Status.PICKING_UP if current[i][2] == Operation.PICK_UP else Status.DELIVERING
+            travel_time = 0
+            if location[i] is not None and location[i] != current[i][0]:
+                travel_time = route.time(location[i], current[i][0])
+                distance[i] += route.distance(location[i], current[i][0])
+            next_time[i] = now + travel_time
+        heapq.heappush(queue, (next_time[i], seq, i))
+        seq += 1
+    return sum(distance), sum(delay)
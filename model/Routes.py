@@ -1,24 +1,93 @@
+import os
+import sys
+
+import numpy as np
+
+
 class Routes:
     """
-    A set of routes between different locations
+    A set of routes between different locations.\n
+    The distances and times are stored in dense float32 matrices indexed by the integer index of the factories,
+    matrix[i, j] is the route from factory_ids[i] to factory_ids[j].
     """
-    def __init__(self, distance_matrix, time_matrix):
-        self.distance_matrix = distance_matrix
-        self.time_matrix = time_matrix
+    def __init__(self, distance_matrix, time_matrix, factory_ids: list):
+        self.distance_matrix = np.asarray(distance_matrix, dtype=np.float32)
+        self.time_matrix = np.asarray(time_matrix, dtype=np.float32)
+        self.factory_ids = [sys.intern(factory_id) for factory_id in factory_ids] # index: factory_id
+        self.factory_index = {factory_id: i for i, factory_id in enumerate(self.factory_ids)} # factory_id: index
+
+    def __len__(self):
+        return len(self.factory_ids)
+
+    def index(self, factory_id) -> int:
+        """
+        Integer index of a factory
+        """
+        try:
+            return self.factory_index[factory_id]
+        except KeyError:
+            raise ValueError(f"Factory id {factory_id} not in route matrix")
+
+    def indices(self, factory_ids) -> np.ndarray:
+        """
+        Integer indices of a sequence of factories
+        """
+        return np.fromiter((self.index(factory_id) for factory_id in factory_ids), dtype=np.intp)
 
     def distance(self, start_id, end_id):
         # Check if start_id or end_id is not in distance_matrix
-        if start_id not in self.distance_matrix or end_id not in self.distance_matrix:
+        if start_id not in self.factory_index or end_id not in self.factory_index:
             raise ValueError("Start or end id not in distance matrix")
 
         # Return the distance between start_id and end_id
-        return self.distance_matrix[start_id][end_id]
+        return float(self.distance_matrix[self.factory_index[start_id], self.factory_index[end_id]])
 
     def time(self, start_id, end_id):
         # Check if start_id or end_id is not in time_matrix
-        if start_id not in self.time_matrix or end_id not in self.time_matrix:
+        if start_id not in self.factory_index or end_id not in self.factory_index:
             raise ValueError("Start or end id not in time matrix")
 
         # Return the time between start_id and end_id
-        return self.time_matrix[start_id][end_id]
+        return float(self.time_matrix[self.factory_index[start_id], self.factory_index[end_id]])
+
+    def distances(self, start_index, end_index) -> np.ndarray:
+        """
+        Distances of all legs (start_index[k], end_index[k]) in one call
+        :param start_index: array of factory indices
+        :param end_index: array of factory indices, broadcastable with start_index
+        :return: array of distances
+        """
+        return self.distance_matrix[start_index, end_index]
+
+    def times(self, start_index, end_index) -> np.ndarray:
+        """
+        Times of all legs (start_index[k], end_index[k]) in one call
+        :param start_index: array of factory indices
+        :param end_index: array of factory indices, broadcastable with start_index
+        :return: array of times
+        """
+        return self.time_matrix[start_index, end_index]
+
+    def save(self, directory: str):
+        """
+        Save the matrices and the factory ids as raw .npy files in directory
+        :param directory: path of the directory, created if it does not exist
+        """
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'distance.npy'), self.distance_matrix)
+        np.save(os.path.join(directory, 'time.npy'), self.time_matrix)
+        np.save(os.path.join(directory, 'factory_ids.npy'), np.array(self.factory_ids, dtype=str))
 
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True):
+        """
+        Load the routes saved by save()
+        :param directory: path of the directory
+        :param mmap: memory-map the matrices (zero-copy, read-only) instead of reading them
+        :return: Routes类实例
+        """
+        mmap_mode = 'r' if mmap else None
+        distance_matrix = np.load(os.path.join(directory, 'distance.npy'), mmap_mode=mmap_mode)
+        time_matrix = np.load(os.path.join(directory, 'time.npy'), mmap_mode=mmap_mode)
+        factory_ids = np.load(os.path.join(directory, 'factory_ids.npy')).tolist()
+        return cls(distance_matrix, time_matrix, factory_ids)
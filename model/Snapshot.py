@@ -0,0 +1,49 @@
+class Snapshot:
+    """
+    State of a DPDPTW model at a point in time, see DPDPTW.snapshot() and DPDPTW.restore().\n
+    The immutable data (Routes, Order objects, factory metadata, vehicle attributes) is shared by reference,
+    only the mutable state is kept:
+        - the clock, the event queue and the orders waiting to be distributed
+        - per vehicle: status, location, time, cost, current assignment, and shallow copies of
+          assignment_list and cargo (lists of references to the shared Order objects)
+        - per vehicle: a mark of the history, the records appended later are dropped by restore()
+        - per factory: the finish time of each port
+    The trace is not rewound: the records emitted after the snapshot stay in the sink.
+    """
+    __slots__ = ('now', 'event_queue', 'event_seq', 'event_count', 'order_list', 'vehicles', 'factories')
+
+    def __init__(self, model):
+        self.now = model.now
+        self.event_queue = list(model.event_queue)
+        self.event_seq = model._event_seq
+        self.event_count = model.event_count
+        self.order_list = list(model.order_list)
+        self.vehicles = {car_num: (vehicle.now, vehicle.location, vehicle.current_assignment,
+                                   list(vehicle.assignment_list), list(vehicle.cargo), vehicle.status,
+                                   vehicle.next_status_time, vehicle.delay, vehicle.distance,
+                                   vehicle.history.mark())
+                         for car_num, vehicle in model.vehicle_dict.items()}
+        self.factories = {factory_id: [port.finish_time for port in factory.port_list]
+                          for factory_id, factory in model.factory_dict.items()}
+
+    def restore(self, model):
+        """
+        Put the model back in the state of the snapshot, the snapshot can be restored again
+        """
+        model.now = self.now
+        model.event_queue = list(self.event_queue)
+        model._event_seq = self.event_seq
+        model.event_count = self.event_count
+        model.order_list = list(self.order_list)
+        for car_num, state in self.vehicles.items():
+            vehicle = model.vehicle_dict[car_num]
+            (vehicle.now, vehicle.location, vehicle.current_assignment, assignment_list, cargo, vehicle.status,
+             vehicle.next_status_time, vehicle.delay, vehicle.distance, mark) = state
+            # 原地修改, 保留其他对象持有的列表引用
+            vehicle.assignment_list[:] = assignment_list
+            vehicle.cargo[:] = cargo
+            # version 只增不减, 以免缓存把恢复后的计划当作同一版本
+            vehicle.version += 1
+            vehicle.history.rewind(mark)
+        for factory_id, finish_times in self.factories.items():
+            model.factory_dict[factory_id].reset_ports(finish_times)
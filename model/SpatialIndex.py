@@ -0,0 +1,87 @@
+import numpy as np
+
+EARTH_RADIUS = 6371.0 # km
+
+
+class SpatialIndex:
+    """
+    Spatial index of the factories and of the route footprints of the vehicles.\n
+    For every factory the other factories are sorted once by their distance (longitude/latitude),
+    the footprint of a vehicle is the set of factories of its plan (location, current assignment, assignment_list).
+    nearest_vehicles() walks the factories outwards from the pick-up and the delivery of an order
+    and collects the vehicles whose footprint contains them.
+    """
+    def __init__(self, factory_dict: dict):
+        """
+        :param factory_dict: {factory_id: Factory}
+        """
+        self.factory_ids = list(factory_dict.keys())
+        self.factory_index = {factory_id: i for i, factory_id in enumerate(self.factory_ids)}
+        longitude = np.radians([factory.longitude for factory in factory_dict.values()])
+        latitude = np.radians([factory.latitude for factory in factory_dict.values()])
+        # equirectangular projection, precise enough at the scale of a city
+        x = longitude * np.cos(latitude.mean()) * EARTH_RADIUS
+        y = latitude * EARTH_RADIUS
+        self.distance_matrix = np.hypot(x[:, None] - x[None, :], y[:, None] - y[None, :])
+        self.neighbors = np.argsort(self.distance_matrix, axis=1, kind='stable') # neighbors[i]: nearest first
+
+        self.footprints = {} # car_num: set of factory_id
+        self._vehicles_at = {} # factory_id: set of car_num
+
+    def footprint(self, vehicle) -> set:
+        """
+        Factories of the plan of the vehicle
+        """
+        footprint = {assignment[0] for assignment in vehicle.assignment_list}
+        if vehicle.current_assignment is not None:
+            footprint.add(vehicle.current_assignment[0])
+        if vehicle.location is not None:
+            footprint.add(vehicle.location)
+        return footprint
+
+    def update(self, vehicle):
+        """
+        Recompute the footprint of a vehicle whose plan has changed
+        """
+        for factory_id in self.footprints.get(vehicle.car_num, ()):
+            self._vehicles_at[factory_id].discard(vehicle.car_num)
+        footprint = self.footprint(vehicle)
+        for factory_id in footprint:
+            self._vehicles_at.setdefault(factory_id, set()).add(vehicle.car_num)
+        self.footprints[vehicle.car_num] = footprint
+
+    def update_all(self, vehicle_dict: dict):
+        for vehicle in vehicle_dict.values():
+            self.update(vehicle)
+
+    def nearest_factories(self, factory_id, k: int) -> list:
+        """
+        The k factories nearest to factory_id, itself first
+        """
+        i = self.factory_index[factory_id]
+        return [self.factory_ids[j] for j in self.neighbors[i, :k]]
+
+    def nearest_vehicles(self, pickup_id, delivery_id, k: int) -> set:
+        """
+        At least k vehicles (fewer if not enough vehicles have a footprint) whose plan passes nearest to
+        the pick-up or the delivery factory
+        :return: set of car_num
+        """
+        result = set()
+        if pickup_id not in self.factory_index or delivery_id not in self.factory_index:
+            return result
+        p, d = self.factory_index[pickup_id], self.factory_index[delivery_id]
+        pickup_neighbors, delivery_neighbors = self.neighbors[p], self.neighbors[d]
+        i = j = 0
+        n = len(self.factory_ids)
+        # 按距离从近到远交替遍历取货点和送货点的邻近工厂
+        while len(result) < k and (i < n or j < n):
+            if j >= n or (i < n and self.distance_matrix[p, pickup_neighbors[i]] <=
+                          self.distance_matrix[d, delivery_neighbors[j]]):
+                factory = pickup_neighbors[i]
+                i += 1
+            else:
+                factory = delivery_neighbors[j]
+                j += 1
+            result.update(self._vehicles_at.get(self.factory_ids[factory], ()))
+        return result
@@ -0,0 +1,14 @@
+from enum import IntEnum
+
+
+class Status(IntEnum):
+    """
+    Status of a vehicle
+    """
+    IDLE = 0
+    PICKING_UP = 1 # driving to a pick-up factory
+    DELIVERING = 2 # driving to a delivery factory
+    LOADING = 3
+    UNLOADING = 4
+    WAITING = 5 # waiting for a free port
+    OFFLINE = 6
@@ -0,0 +1,92 @@
+import collections
+import json
+
+
+class NullSink:
+    """
+    Discard every record
+    """
+    def write(self, record: dict):
+        pass
+
+    def close(self):
+        pass
+
+
+class RingBufferSink:
+    """
+    Keep the last capacity records in memory
+    """
+    def __init__(self, capacity: int = 10000):
+        self.records = collections.deque(maxlen=capacity)
+
+    def write(self, record: dict):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """
+    Write one json object per record and per line
+    """
+    def __init__(self, file):
+        """
+        :param file: file path or writable text file object
+        """
+        if isinstance(file, str):
+            self.file = open(file, 'w', encoding='utf-8')
+            self._owns_file = True
+        else:
+            self.file = file
+            self._owns_file = False
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, default=str) + '\n')
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
+class Trace:
+    """
+    Structured trace of the simulation.\n
+    Records are dicts sent to a sink when their level is enabled. Callers check the level before building a record,
+    e.g. ``if trace.level >= Trace.EVENT: trace.emit(Trace.EVENT, 'arrive', ...)``, so a disabled trace costs one
+    comparison.
+    Levels:
+        - OFF: nothing
+        - EVENT: every status change of a vehicle
+        - DEBUG: EVENT and the full state of the vehicle after each status change
+    """
+    OFF = 0
+    EVENT = 1
+    DEBUG = 2
+
+    def __init__(self, level: int = OFF, sink=None):
+        if sink is None:
+            sink = NullSink()
+        self.level = level if not isinstance(sink, NullSink) else Trace.OFF
+        self.sink = sink
+
+    def __deepcopy__(self, memo):
+        # 规划用的模型副本不记录
+        return Trace()
+
+    def emit(self, level: int, event: str, **fields):
+        """
+        Send a record to the sink if level is enabled
+        :param level: Trace.EVENT or Trace.DEBUG
+        :param event: name of the event
+        :param fields: content of the record, must be json serializable (or convertible by str)
+        """
+        if level <= self.level:
+            fields['event'] = event
+            self.sink.write(fields)
+
+    def close(self):
+        self.sink.close()
@@ -1,11 +1,18 @@
-import copy
+from model.History import VehicleHistory
+from model.Operation import Operation
+from model.Status import Status
 
 
 class Vehicle:
     """
     A vehicle
     """
-    def __init__(self, car_num, capacity, operation_time, gps_id):
+    __slots__ = ('car_num', 'capacity', 'operation_time', 'gps_id', 'route',
+                 'history', 'delay', 'distance',
+                 'now', 'location', 'current_assignment', 'assignment_list', 'cargo', 'status', 'next_status_time',
+                 'version')
+
+    def __init__(self, car_num, capacity, operation_time, gps_id, history_capacity: int = None):
         # 属性
         self.car_num = car_num # unique
         self.capacity = capacity
@@ -14,17 +21,19 @@ class Vehicle:
         self.route = None
 
         # 历史状态(每次状态变化都记录)
-        self.history_info = [('time', 'action', 'Factory_id', 'condition', 'next_status')] # list of (time, action, Factory, load), where action is 'PICK_UP' or 'DELIVER' or 'LOAD' or 'UNLOAD' or 'WAIT'
+        self.history = VehicleHistory(history_capacity) # (time, action, Factory index, status), see history_info
         self.delay = 0 # 延误时间
         self.distance = 0
 
         # 当前状态
         self.now = 0 # 当前时间
+        self.location = None # Factory_id of the last visited factory, None before the first assignment
         self.current_assignment = None # (Factory_id, Order, operation)
-        self.assignment_list = [] # list of (Factory_id, Order, operation), where operation is 'PICK_UP' or 'DELIVER'
+        self.assignment_list = [] # list of (Factory_id, Order, Operation)
         self.cargo = [] # list of (Factory_id, demand), LIFO
-        self.status = 'IDLE'  # 'PICKING_UP', 'DELIVERING', 'LOADING', 'UNLOADING', 'WAITING', 'IDLE', 'OFFLINE'
-        self.next_status_time = None  # time of next status change
+        self.status = Status.IDLE
+        self.next_status_time = None  # absolute time of next status change, None if idle
+        self.version = 0 # incremented on every change of assignment_list, see BasicMethod.best_insertion
 
     def __str__(self):
         return f"Vehicle({self.car_num})"
@@ -42,16 +51,36 @@ class Vehicle:
         """
         if pickup_position > delivery_position:
             raise ValueError("Pickup position should be less than delivery position")
-        # 在self.assignment_list的索引为pickup_position的元素后插入(order.pickup_factory, order, 'PICK_UP')
+        # 在self.assignment_list的索引为pickup_position的元素后插入(order.pickup_id, order, Operation.PICK_UP)
         if not self.assignment_list:
-            self.assignment_list.append((order.pickup_id, order, 'PICK_UP'))
-            self.assignment_list.append((order.delivery_id, order, 'DELIVER'))
+            self.assignment_list.append((order.pickup_id, order, Operation.PICK_UP))
+            self.assignment_list.append((order.delivery_id, order, Operation.DELIVER))
         else:
-            self.assignment_list.insert(delivery_position + 1, (order.delivery_id, order, 'DELIVER'))
-            self.assignment_list.insert(pickup_position + 1, (order.pickup_id, order, 'PICK_UP'))
-        # self.assignment_list.insert(delivery_position + 1, (order.delivery_id, order, 'DELIVER'))
+            self.assignment_list.insert(pickup_position + 1, (order.pickup_id, order, Operation.PICK_UP))
+            self.assignment_list.insert(delivery_position + 2, (order.delivery_id, order, Operation.DELIVER))
+        self.version += 1
+        # self.assignment_list.insert(delivery_position + 1, (order.delivery_id, order, Operation.DELIVER))
         # print(f"add_order at ({pickup_position}, {delivery_position}): {self.assignment_list}")
-        self.history_info.append((self.now, 'add_order', order.pickup_id, 'condition 0', 'STILL'))
+        self.record('add_order', order.pickup_id)
+
+    @property
+    def history_info(self) -> list:
+        """
+        The recorded history as a list of (time, action, Factory_id, status),
+        where action is 'add_order', 'begin', 'arrive', 'load' or 'unload'
+        """
+        return self.history.records(self.route.factory_ids if self.route is not None else None)
+
+    def record(self, action, factory_id, status=None):
+        """
+        Record a status change at self.now
+        :param status: status after the change, self.status by default
+        """
+        if self.history.enabled:
+            factory_index = -1
+            if factory_id is not None and self.route is not None:
+                factory_index = self.route.factory_index.get(factory_id, -1)
+            self.history.append(self.now, action, factory_index, self.status if status is None else status)
 
     def remove_order(self, order):
         """
@@ -59,9 +88,8 @@ class Vehicle:
         :param order:
         :return:
         """
-        for assignment in self.assignment_list:
-            if assignment[1] == order:
-                self.assignment_list.remove(assignment)
+        self.assignment_list[:] = [assignment for assignment in self.assignment_list if assignment[1] != order]
+        self.version += 1
         # 不能移除正在进行的任务
         if self.current_assignment and self.current_assignment[1] == order:
             raise ValueError("Cannot remove the order that is currently being performed")
@@ -73,51 +101,79 @@ class Vehicle:
         """
         if pickup_position > delivery_position:
             return False
-        cargo_list = [order.delivery_id for order in self.cargo]
+        cargo_list = list(self.cargo)
         assignment_list = [assignment for assignment in self.assignment_list]
         if not assignment_list:
             return True
         # 货物匹配
-        assignment_list.insert(delivery_position + 1, (order.delivery_id, order, 'DELIVER'))
-        assignment_list.insert(pickup_position + 1, (order.pickup_id, order, 'PICK_UP'))
-        if self.current_assignment[2] == 'PICK_UP':
-            cargo_list.append(self.current_assignment[1].delivery_id)
-        elif self.current_assignment[2] == 'DELIVER':
+        assignment_list.insert(pickup_position + 1, (order.pickup_id, order, Operation.PICK_UP))
+        assignment_list.insert(delivery_position + 2, (order.delivery_id, order, Operation.DELIVER))
+        if self.current_assignment[2] == Operation.PICK_UP:
+            cargo_list.append(self.current_assignment[1])
+        elif self.current_assignment[2] == Operation.DELIVER:
             # 卸货与货物
-            if self.current_assignment[1].delivery_id != cargo_list.pop():
+            if not cargo_list or self.current_assignment[1] is not cargo_list.pop():
                 return False
         for assignment in assignment_list:
-            if assignment[2] == 'PICK_UP':
-                cargo_list.append(assignment[1].delivery_id)
+            if assignment[2] == Operation.PICK_UP:
+                cargo_list.append(assignment[1])
             else:
                 if not cargo_list:
                     return False
-                elif assignment[1].delivery_id != cargo_list.pop():
+                elif assignment[1] is not cargo_list.pop():
                     return False
         return True
 
-    def check_capacity(self, order):
+    def check_capacity(self, order, pickup_position, delivery_position) -> bool:
         """
-        检查当前任务下的载重是否超过车辆容量
+        检查插入订单后的载重是否超过车辆容量
+        The order is on board from after assignment_list[pickup_position] to after assignment_list[delivery_position]
         :return:
         """
-        load = 0
-        for order in self.cargo:
-            load += order.demand
-        for assignment in self.assignment_list:
+        load = sum(cargo.demand for cargo in self.cargo)
+        # 当前任务完成后的载重
+        if self.current_assignment is not None:
+            if self.current_assignment[2] == Operation.PICK_UP:
+                load += self.current_assignment[1].demand
+            else:
+                load -= self.current_assignment[1].demand
+        last = len(self.assignment_list) - 1
+        pickup_position, delivery_position = min(pickup_position, last), min(delivery_position, last)
+        for k, assignment in enumerate(self.assignment_list):
             # load
-            if assignment[2] == 'PICK_UP':
+            if assignment[2] == Operation.PICK_UP:
                 load += assignment[1].demand
             # unload
             else:
                 load -= assignment[1].demand
             if load > self.capacity or load < 0:
                 return False
-            if load + order.demand > self.capacity:
+            if pickup_position <= k <= delivery_position and load + order.demand > self.capacity:
                 return False
         return True
 
-    def print_information(self, test_print = 1):
+    def information(self) -> dict:
+        """
+        Current state of the vehicle, for the DEBUG level of the trace
+        """
+        return {'car_num': self.car_num,
+                'now': self.now,
+                'status': self.status.name,
+                'location': self.location,
+                'next_status_time': self.next_status_time,
+                'current_assignment': self._assignment_info(self.current_assignment),
+                'assignment_list': [self._assignment_info(assignment) for assignment in self.assignment_list],
+                'cargo': [order.order_id for order in self.cargo],
+                'delay': self.delay,
+                'distance': self.distance}
+
+    @staticmethod
+    def _assignment_info(assignment):
+        if assignment is None:
+            return None
+        return assignment[0], assignment[1].order_id, assignment[2].name
+
+    def print_information(self, test_print = 0):
         if test_print:
             print(f"=========={self.car_num}==========")
             print(f"history_info: {self.history_info}")
@@ -137,14 +193,14 @@ class Vehicle:
         :return:
         """
         # 车辆空闲
-        if self.status == 'IDLE':
+        if self.status == Status.IDLE:
             # 没有任何任务
             if self.current_assignment:
                 return False
             elif self.assignment_list:
                 return False
         # 正在送货
-        elif self.status == 'DELIVERING':
+        elif self.status == Status.DELIVERING:
             # 有货
             if not self.cargo:
                 return False
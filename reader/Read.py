@@ -1,10 +1,11 @@
-import math
+import hashlib
+import json
 import os
-from functools import reduce
+import numpy as np
 import pandas as pd
 
 from model.Factory import Factory
-from model.Order import Order
+from model.OrderTable import COLUMNS, OrderTable, OrderSlice
 from model.Routes import Routes
 from model.Vehicle import Vehicle
 
@@ -73,82 +74,245 @@ class Read:
     @classmethod
     def order_to_slices(cls, path: str,
                         vehicle_capacity: int = 15,
-                        slice_size: int = 0) -> dict:
+                        slice_size: int = 0,
+                        split: str = 'pack') -> dict:
         """
-        读取path路径下的csv文件, 将其按照时间顺序分割成多个slice, 如果单个订单超载, 则拆分订单至最小单位
+        读取path路径下的csv文件, 将其按照时间顺序分割成多个slice, 如果单个订单超载, 则拆分订单
+        The parsing, sorting, splitting and slicing are array operations on a columnar OrderTable,
+        the Order objects are only created when a slice is iterated.
         :param vehicle_capacity:
         :param path:
         :param slice_size: 每个slice的大小, 默认为0, 表示按 load_time 的最大公约数切分
-        :return: 一个字典, key为切分的时间, value为该时间段内的订单列表
+        :param split: splitting of the oversize orders, see _split_oversize()
+        :return: 一个字典, key为切分的时间, value为该时间段内的订单 (OrderSlice, 可当作 Order 列表使用)
         """
-        df = pd.read_csv(path)
-        # 将时间转换为秒数
-        df['creation_time'] = pd.to_datetime(df['creation_time'], format='%H:%M:%S')
-        df['creation_time'] = df['creation_time'].apply(lambda x: x.hour * 3600 + x.minute * 60 + x.second)
-        df['committed_completion_time'] = pd.to_datetime(df['committed_completion_time'], format='%H:%M:%S')
-        df['committed_completion_time'] = df['committed_completion_time'].apply(lambda x: x.hour * 3600 + x.minute * 60 + x.second)
-        # 按 creation_time 排序
-        df = df.sort_values(by='creation_time')
+        columns = cls._order_columns(pd.read_csv(path), vehicle_capacity, split)
 
         # slice_size 默认为 load_time 的最大公约数
         if not slice_size:
-            load_times = df['load_time']
-            slice_size = reduce(math.gcd, load_times)
-        # print(f"slice_size: {slice_size}")
+            slice_size = int(np.gcd.reduce(columns['load_time']))
 
-        # 按照 slice_size 分割
-        slice_dict = {}
-        slice_end = 0
-        for row in df.itertuples():
-            # 如果单个订单已经超载, 则拆分订单
-            if row.demand > vehicle_capacity:
-                order_list = []
-                # 按 q_standard, q_small, q_box 拆分订单
-                for i in range(row.q_standard):
-                    order = Order(row.order_id, row.q_standard, 0, 0, row.q_standard * 1,
-                                  row.creation_time, row.committed_completion_time, row.load_time, row.unload_time,
-                                  row.pickup_id, row.delivery_id)
-                    order_list.append(order)
-                for i in range(row.q_small):
-                    order = Order(row.order_id, 0, row.q_small, 0, row.q_small * 0.5,
-                                  row.creation_time, row.committed_completion_time, row.load_time, row.unload_time,
-                                  row.pickup_id, row.delivery_id)
-                    order_list.append(order)
-                for i in range(row.q_box):
-                    order = Order(row.order_id, 0, 0, row.q_box, row.q_box * 0.25,
-                                  row.creation_time, row.committed_completion_time, row.load_time, row.unload_time,
-                                  row.pickup_id, row.delivery_id)
-                    order_list.append(order)
-
-            # 如果单个订单未超载, 生成单个订单
-            else:
-                order = Order(row.order_id, row.q_standard, row.q_small, row.q_box, row.demand,
-                              row.creation_time, row.committed_completion_time, row.load_time, row.unload_time,
-                              row.pickup_id, row.delivery_id)
-                order_list = [order]
-
-            # 按照订单的创建时间分割订单
-            for order in order_list:
-                # new slice
-                if order.creation_time > slice_end:
-                    slice_end = order.creation_time - order.creation_time % slice_size
-                    slice_dict[slice_end] = []
-                slice_dict[slice_end].append(order)
-        return slice_dict
+        # 按照订单的创建时间分割订单, 每个slice是排序后表中的一段连续行
+        table = OrderTable(columns)
+        slice_keys = columns['creation_time'] - columns['creation_time'] % slice_size
+        keys, starts = np.unique(slice_keys, return_index=True)
+        stops = np.append(starts[1:], len(table))
+        return {int(key): OrderSlice(table, int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)}
+
+    @classmethod
+    def order_stream(cls, source,
+                     vehicle_capacity: int = 15,
+                     slice_size: int = 0,
+                     chunksize: int = 1000,
+                     split: str = 'pack'):
+        """
+        逐块读取订单csv, 依次生成 (slice时间, 订单), 不需要一次读入整个文件.\n
+        The orders are expected in creation_time order (as in the benchmark files). A slice is yielded as soon as
+        an order of a later slice is read, so only the current chunk is kept in memory. An order arriving after
+        its slice was yielded is put into the next slice.
+        :param source: path or file-like object of the order csv
+        :param vehicle_capacity:
+        :param slice_size: 每个slice的大小, 默认为0, 表示按第一块订单 load_time 的最大公约数切分
+        :param chunksize: number of csv rows read at once
+        :param split: splitting of the oversize orders, see _split_oversize()
+        :return: generator of (slice_end, OrderSlice)
+        """
+        pending = None # columns of the last, possibly incomplete slice
+        pending_key = None
+        for df in pd.read_csv(source, chunksize=chunksize):
+            columns = cls._order_columns(df, vehicle_capacity, split)
+            if pending is not None:
+                columns = {name: np.concatenate((pending[name], values)) for name, values in columns.items()}
+            if not len(columns['order_id']):
+                continue
+            if not slice_size:
+                slice_size = int(np.gcd.reduce(columns['load_time']))
+            slice_keys = columns['creation_time'] - columns['creation_time'] % slice_size
+            if pending_key is not None:
+                # 迟到的订单并入下一个slice
+                slice_keys = np.maximum(slice_keys, pending_key)
+            order = np.argsort(slice_keys, kind='stable')
+            columns = {name: values[order] for name, values in columns.items()}
+            slice_keys = slice_keys[order]
+
+            # 最后一个slice可能还未读完, 留到下一块
+            last = np.searchsorted(slice_keys, slice_keys[-1])
+            table = OrderTable({name: values[:last] for name, values in columns.items()})
+            keys, starts = np.unique(slice_keys[:last], return_index=True)
+            stops = np.append(starts[1:], last)
+            for key, start, stop in zip(keys, starts, stops):
+                yield int(key), OrderSlice(table, int(start), int(stop))
+            pending = {name: values[last:] for name, values in columns.items()}
+            pending_key = slice_keys[-1]
+        if pending is not None:
+            yield int(pending_key), OrderSlice(OrderTable(pending), 0, len(pending['order_id']))
+
+    @classmethod
+    def _order_columns(cls, df: pd.DataFrame, vehicle_capacity, split: str = 'pack') -> dict:
+        """
+        Columns of the orders of df, with the times in seconds and the oversize orders split, sorted by creation_time
+        """
+        columns = {name: df[name].to_numpy() for name in COLUMNS}
+        # 将时间转换为秒数
+        columns['creation_time'] = cls._hms_to_seconds(columns['creation_time'])
+        columns['committed_completion_time'] = cls._hms_to_seconds(columns['committed_completion_time'])
+        columns['pickup_id'] = columns['pickup_id'].astype(str)
+        columns['delivery_id'] = columns['delivery_id'].astype(str)
+
+        # 如果单个订单已经超载, 则按 q_standard, q_small, q_box 拆分订单
+        oversize = columns['demand'] > vehicle_capacity
+        if oversize.any():
+            columns = cls._split_oversize(columns, oversize, vehicle_capacity, split)
+
+        # 按 creation_time 排序 (稳定排序, 拆分后的订单保持原顺序)
+        order = np.argsort(columns['creation_time'], kind='stable')
+        return {name: values[order] for name, values in columns.items()}
+
+    @classmethod
+    def _hms_to_seconds(cls, values) -> np.ndarray:
+        """
+        Convert an array of 'HH:MM:SS' strings into seconds
+        """
+        text = np.asarray(values).astype('S8')
+        if (np.char.str_len(text) == 8).all():
+            digits = text.view(np.uint8).reshape(-1, 8).astype(np.int64) - ord('0')
+            return (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 3] * 10 + digits[:, 4]) * 60 + \
+                digits[:, 6] * 10 + digits[:, 7]
+        # 非定长格式 (如 H:MM:SS)
+        return pd.to_timedelta(pd.Series(values, dtype=str)).dt.total_seconds().to_numpy(dtype=np.int64)
+
+    @classmethod
+    def _split_oversize(cls, columns: dict, oversize: np.ndarray, vehicle_capacity, split: str = 'pack') -> dict:
+        """
+        Replace every oversize order by sub-orders of the same order_id, time window and factories:
+            - 'pack': the fewest sub-orders of at most vehicle_capacity (floored to whole standard pallets).
+              The pieces are packed by decreasing size (standard 1, small 0.5, box 0.25): every size divides
+              the sizes before it and the capacity, so each sub-order but the last is exactly full
+              and the number of sub-orders is ceil(demand / capacity), the minimum.
+            - 'unit': one sub-order per pallet/box, (1, 0, 0), (0, 1, 0) or (0, 0, 1)
+        The demand of a sub-order is the demand of its pieces. Its load and unload times are the share of
+        the times of the order in proportion to its demand, in whole seconds that add up to the times of the order.
+        """
+        categories = ('q_standard', 'q_small', 'q_box')
+        weights = np.array([1.0, 0.5, 0.25])
+        rows = np.flatnonzero(oversize)
+        quantities = np.stack([columns[category][rows] for category in categories], axis=1).astype(np.int64)
+        # 各类货物在装箱序列中的区间 [begin, end)
+        end = np.cumsum(quantities * weights, axis=1)
+        begin = end - quantities * weights
+
+        # 每个子订单在装箱序列中的区间 [low, high)
+        if split == 'pack':
+            capacity = float(np.floor(vehicle_capacity))
+            if capacity < 1:
+                raise ValueError("The vehicle capacity must hold a standard pallet to split the orders")
+            counts = np.ceil(end[:, -1] / capacity).astype(np.int64)
+            parent = np.repeat(np.arange(len(rows)), counts)
+            k = np.arange(len(parent)) - np.repeat(np.cumsum(counts) - counts, counts) # 子订单在其订单内的序号
+            low = k * capacity
+            high = np.minimum(low + capacity, end[parent, -1])
+        elif split == 'unit':
+            flat = quantities.ravel() # (订单, 类别) 按行展开
+            parent = np.repeat(np.repeat(np.arange(len(rows)), len(categories)), flat)
+            category = np.repeat(np.tile(np.arange(len(categories)), len(rows)), flat)
+            k = np.arange(len(parent)) - np.repeat(np.cumsum(flat) - flat, flat) # 货物在其类别内的序号
+            low = begin[parent, category] + k * weights[category]
+            high = low + weights[category]
+        else:
+            raise ValueError(f"Invalid split mode '{split}', expected 'pack' or 'unit'")
+
+        # 原顺序: 未拆分订单与拆分后的子订单按原行号排列
+        keep = np.flatnonzero(~oversize)
+        source = np.concatenate((keep, rows[parent]))
+        order = np.argsort(source, kind='stable')
+        result = {name: values[source][order] for name, values in columns.items()}
+        for j, category in enumerate(categories):
+            overlap = np.clip(np.minimum(high, end[parent, j]) - np.maximum(low, begin[parent, j]), 0, None)
+            values = np.concatenate((columns[category][keep], np.rint(overlap / weights[j])))
+            result[category] = values.astype(columns[category].dtype)[order]
+        # 装卸时间按货量比例分配: 累计值取整后相减, 子订单的时间之和等于原订单的时间
+        total = end[parent, -1]
+        for name in ('load_time', 'unload_time'):
+            time = columns[name][rows][parent]
+            share = np.rint(time * high / total) - np.rint(time * low / total)
+            values = np.concatenate((columns[name][keep], share))
+            result[name] = values.astype(columns[name].dtype)[order]
+        demand = np.concatenate((columns['demand'][keep], high - low))
+        result['demand'] = demand.astype(np.result_type(columns['demand'].dtype, np.float64))[order]
+        return result
 
     @classmethod
-    def route(cls, path: str) -> Routes:
+    def route(cls, path: str, cache: bool = True) -> Routes:
         """
         读取path路径下的csv文件, 读取路线信息
+        The built matrices are cached in the directory path + '.cache' and memory-mapped on the next call,
+        the cache is rebuilt when the size, mtime and hash of the csv file no longer match.
+        :param path:
+        :param cache: use (and create) the binary cache
+        :return: Routes类实例
+        """
+        if not cache:
+            return cls._route_from_csv(path)
+        cache_dir = path + '.cache'
+        meta_path = os.path.join(cache_dir, 'meta.json')
+        stat = os.stat(path)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+                return Routes.load(cache_dir)
+            # 文件被修改时间改变但内容未变
+            if meta['size'] == stat.st_size and meta['sha1'] == cls._sha1(path):
+                meta['mtime_ns'] = stat.st_mtime_ns
+                with open(meta_path, 'w') as f:
+                    json.dump(meta, f)
+                return Routes.load(cache_dir)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        routes = cls._route_from_csv(path)
+        try:
+            # meta.json 最后写入, 写入中断时缓存无效
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            routes.save(cache_dir)
+            with open(meta_path, 'w') as f:
+                json.dump({'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha1': cls._sha1(path)}, f)
+        except OSError as e:
+            print(f"Warning: cannot write route cache '{cache_dir}': {e}")
+        return routes
+
+    @classmethod
+    def _sha1(cls, path: str) -> str:
+        sha1 = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        return sha1.hexdigest()
+
+    @classmethod
+    def _route_from_csv(cls, path: str) -> Routes:
+        """
+        读取路线信息csv文件, 构建距离和时间矩阵
         :param path:
         :return: Routes类实例
         """
         df = pd.read_csv(path)
 
-        # Create pivot tables
-        d_matrix = df.pivot(index='start_factory_id', columns='end_factory_id', values='distance')
-        t_matrix = df.pivot(index='start_factory_id', columns='end_factory_id', values='time')
-        return Routes(d_matrix, t_matrix)
+        # factory_id -> int 索引
+        factory_ids = sorted(set(df['start_factory_id']) | set(df['end_factory_id']))
+        factory_index = pd.Index(factory_ids)
+        start = factory_index.get_indexer(df['start_factory_id'])
+        end = factory_index.get_indexer(df['end_factory_id'])
+
+        # Create dense matrices, the route from a factory to itself is 0
+        d_matrix = np.full((len(factory_ids), len(factory_ids)), np.nan, dtype=np.float32)
+        t_matrix = np.full((len(factory_ids), len(factory_ids)), np.nan, dtype=np.float32)
+        d_matrix[start, end] = df['distance'].to_numpy()
+        t_matrix[start, end] = df['time'].to_numpy()
+        np.fill_diagonal(d_matrix, 0)
+        np.fill_diagonal(t_matrix, 0)
+        return Routes(d_matrix, t_matrix, factory_ids)
 
     @classmethod
     def vehicle(cls, path: str) -> list[Vehicle]:
@@ -200,10 +364,9 @@ if __name__ == '__main__':
     # routes = Read.route("D:\\Project\\ICAPS-2021\\data\\test\\route_info.csv")
     # start_factory = '9829a9e1f6874f28b33b57a7a42bb49f'
     # end_factory = 'c1e1e4250f63479ca9261967f84b6719'
-    # distance = routes.distance_matrix[start_factory][end_factory]
-    # distance = routes.distance_matrix.loc[start_factory, end_factory]
+    # distance = routes.distance(start_factory, end_factory)
     # print(f"Distance from {start_factory} to {end_factory}: {distance}")
-    # time = routes.time_matrix.loc[start_factory, end_factory]
+    # time = routes.time(start_factory, end_factory)
     # print(f"Time from {start_factory} to {end_factory}: {time}")
 
     # test vehicle()
@@ -0,0 +1,35 @@
+import unittest
+
+import numpy as np
+
+from model.OrderTable import OrderTable, OrderSlice
+
+
+def columns(order_id):
+    return {'order_id': order_id,
+            'q_standard': np.array([1, 0]), 'q_small': np.array([0, 2]), 'q_box': np.array([0, 0]),
+            'demand': np.array([1.0, 1.0]),
+            'creation_time': np.array([0, 60]), 'committed_completion_time': np.array([3600, 3660]),
+            'load_time': np.array([120, 120]), 'unload_time': np.array([120, 120]),
+            'pickup_id': np.array(['a', 'b'], dtype=object), 'delivery_id': np.array(['b', 'a'], dtype=object)}
+
+
+class OrderTableTest(unittest.TestCase):
+    def test_string_order_ids(self):
+        table = OrderTable(columns(np.array(['0000570001', '0001580002'], dtype=object)))
+        orders = list(OrderSlice(table, 0, 2))
+        self.assertEqual([order.order_id for order in orders], ['0000570001', '0001580002'])
+        self.assertEqual(orders[1].q_small, 2)
+        self.assertIs(type(orders[1].demand), float)
+        self.assertEqual(orders[0].pickup_id, 'a')
+
+    def test_numeric_order_ids(self):
+        table = OrderTable(columns(np.array([570001, 1580002])))
+        order = table.order(0)
+        self.assertIs(type(order.order_id), int)
+        self.assertIs(type(order.load_time), int)
+        self.assertIs(table.order(0), order)
+
+
+if __name__ == '__main__':
+    unittest.main()
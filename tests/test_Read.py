@@ -0,0 +1,41 @@
+import unittest
+
+import pandas as pd
+
+from reader.Read import Read
+
+
+def orders():
+    # 2120005: demand 17, 240 s per unit of demand as in the benchmark data
+    return pd.DataFrame({'order_id': [2120005, 2120006],
+                         'q_standard': [15, 1], 'q_small': [3, 0], 'q_box': [2, 0],
+                         'demand': [17.0, 1.0],
+                         'creation_time': ['00:01:00', '00:02:00'],
+                         'committed_completion_time': ['04:01:00', '04:02:00'],
+                         'load_time': [4080, 240], 'unload_time': [4080, 240],
+                         'pickup_id': ['a', 'b'], 'delivery_id': ['b', 'a']})
+
+
+class SplitOversizeTest(unittest.TestCase):
+    def check_split(self, split, parts):
+        columns = Read._order_columns(orders(), 15, split)
+        sub = columns['order_id'] == 2120005
+        self.assertEqual(sub.sum(), parts)
+        self.assertAlmostEqual(columns['demand'][sub].sum(), 17.0)
+        self.assertEqual(columns['load_time'][sub].sum(), 4080)
+        self.assertEqual(columns['unload_time'][sub].sum(), 4080)
+        self.assertEqual(list(columns['load_time'][sub]), [round(240 * demand) for demand in columns['demand'][sub]])
+        # 未拆分的订单不变
+        self.assertEqual(list(columns['load_time'][~sub]), [240])
+        return columns
+
+    def test_pack(self):
+        columns = self.check_split('pack', 2)
+        self.assertEqual(list(columns['demand'][columns['order_id'] == 2120005]), [15.0, 2.0])
+
+    def test_unit(self):
+        self.check_split('unit', 20)
+
+
+if __name__ == '__main__':
+    unittest.main()